@@ -7,20 +7,61 @@ and other MyAI4 services.
 
 import os
 import json
+import time
 import boto3
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from botocore.exceptions import ClientError
 
 # Initialize AWS resources
 dynamodb = boto3.resource('dynamodb')
 ssm = boto3.client('ssm')
 
-# Environment variables - populated from CloudFormation template
-PROFILE_TABLE = os.environ.get('PROFILE_TABLE')  # This points to the ProfilesTable resource
-ACCOUNT_TABLE = os.environ.get('ACCOUNT_TABLE')  # Table for user accounts (imported from infrastructure stack)
-SUBSCRIPTIONS_TABLE = os.environ.get('SUBSCRIPTION_TABLE')
-USER_USAGE_TABLE = os.environ.get('USER_USAGE_TABLE')
+def _load_config() -> Dict[str, Any]:
+    """
+    Load this function's configuration from SSM Parameter Store in a single call
+    The parameter is a JSON object stored at /myai4/<function name>/config and is
+    fetched once per container at cold start. Outside Lambda (e.g. local runs) an
+    empty dict is returned so callers fall back to env vars. Inside Lambda the
+    parameter is the only source of configuration, so a failed GetParameter or a
+    value that is not a JSON object is raised: the init fails and is retried rather
+    than leaving the container without its table names for its whole lifetime.
+    """
+    function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+    if not function_name:
+        return {}
+    
+    try:
+        response = ssm.get_parameter(Name=f"/myai4/{function_name}/config")
+        config = json.loads(response['Parameter']['Value'])
+    except (ClientError, ValueError) as e:
+        print(f"Could not load config parameter: {str(e)}")
+        raise
+    
+    if not isinstance(config, dict):
+        raise ValueError(f"Config parameter must be a JSON object, got {type(config).__name__}")
+    return config
+
+_cfg = _load_config()
+
+def get_config(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Get a configuration value from the SSM config, falling back to the environment"""
+    value = _cfg.get(name)
+    if value:
+        return value
+    return os.environ.get(name, default)
+
+# Configuration - populated from the SSM config parameter created by the CloudFormation template
+PROFILE_TABLE = get_config('PROFILE_TABLE')  # This points to the ProfilesTable resource
+ACCOUNT_TABLE = get_config('ACCOUNT_TABLE')  # Table for user accounts (imported from infrastructure stack)
+SUBSCRIPTIONS_TABLE = get_config('SUBSCRIPTION_TABLE')
+USER_USAGE_TABLE = get_config('USER_USAGE_TABLE')
+
+# In-memory profile cache, reused across warm invocations of the same container.
+# Keyed by (accountId, profileId) -> (fetched_at, profile). The TTL is kept short
+# because other containers may still write to the table.
+_PROFILE_CACHE: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_CACHE_TTL = 30.0
 
 # Removing Cognito resources as auth will be handled by API Gateway
 # USER_POOL_ID and IDENTITY_POOL_ID are not needed anymore
@@ -28,7 +69,7 @@ USER_USAGE_TABLE = os.environ.get('USER_USAGE_TABLE')
 # Mock RapidAPI key function - remove when integrating
 def get_rapidapi_key():
     """Get RapidAPI key from AWS Secrets Manager"""
-    secret_name = os.environ.get('RAPIDAPI_SECRET_NAME')
+    secret_name = get_config('RAPIDAPI_SECRET_NAME')
     if not secret_name:
         raise ValueError("RAPIDAPI_SECRET_NAME environment variable not set")
     
@@ -56,7 +97,7 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     """Test handler for API connectivity and diagnostics"""
     # Get the Lambda function name from the context
     function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'unknown')
-    environment = os.environ.get('ENVIRONMENT', 'unknown')
+    environment = get_config('ENVIRONMENT', 'unknown')
     
     # Check if we can access DynamoDB tables
     table_status = {}
@@ -67,7 +108,7 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
         'ACCOUNT_TABLE', 'PROFILE_TABLE', 'SUBSCRIPTION_TABLE', 'USER_USAGE_TABLE',
         'RAPIDAPI_SECRET_NAME', 'ENVIRONMENT', 'IDENTITY_POOL_ID'
     ]:
-        if not os.environ.get(env_var):
+        if not get_config(env_var):
             warnings.append(f"Environment variable {env_var} is not set")
     
     # Check all tables
@@ -106,7 +147,7 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
 
     # Check environment variables for infrastructure resources
     parameter_status = {}
-    identity_pool_id = os.environ.get('IDENTITY_POOL_ID')
+    identity_pool_id = get_config('IDENTITY_POOL_ID')
     if identity_pool_id:
         parameter_status['IDENTITY_POOL_ID'] = {
             'status': 'accessible',
@@ -150,9 +191,9 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
 
 def get_allowed_origin(request_origin: str) -> str:
     """Determine the appropriate CORS origin response"""
-    environment = os.environ.get('ENVIRONMENT', 'dev')
-    cloudfront_domain = os.environ.get('CLOUDFRONT_DOMAIN', '')
-    local_origins_str = os.environ.get('LOCAL_ORIGINS', '')
+    environment = get_config('ENVIRONMENT', 'dev')
+    cloudfront_domain = get_config('CLOUDFRONT_DOMAIN', '')
+    local_origins_str = get_config('LOCAL_ORIGINS', '')
     
     allowed_origins = set()
     
@@ -163,7 +204,7 @@ def get_allowed_origin(request_origin: str) -> str:
             allowed_origins.add(f"https://{cloudfront_domain}")
             
         # Add custom domains
-        custom_domains = os.environ.get('CUSTOM_DOMAINS', '').split(',')
+        custom_domains = get_config('CUSTOM_DOMAINS', '').split(',')
         for domain in custom_domains:
             if domain:
                 allowed_origins.add(f"https://{domain.strip()}")
@@ -332,6 +373,12 @@ def handle_get_profile(data: Dict[str, Any]) -> Dict[str, Any]:
     if not PROFILE_TABLE:
         return {'error': 'PROFILE_TABLE environment variable is not configured'}
     
+    # Serve from the in-memory cache if the entry is still fresh
+    cache_key = (accountId, profileId)
+    cached = _PROFILE_CACHE.get(cache_key)
+    if cached and time.monotonic() - cached[0] < _CACHE_TTL:
+        return {'profile': cached[1]}
+    
     try:
         # Get the profile from DynamoDB
         table = dynamodb.Table(PROFILE_TABLE)
@@ -345,6 +392,8 @@ def handle_get_profile(data: Dict[str, Any]) -> Dict[str, Any]:
         if 'Item' not in response:
             return {'error': f'Profile not found for accountId: {accountId}, profileId: {profileId}', 'statusCode': 404}
         
+        _PROFILE_CACHE[cache_key] = (time.monotonic(), response['Item'])
+        
         # Return the profile
         return {'profile': response['Item']}
     
@@ -396,6 +445,7 @@ def handle_create_profile(data: Dict[str, Any]) -> Dict[str, Any]:
         # Store the profile in DynamoDB
         table = dynamodb.Table(PROFILE_TABLE)
         table.put_item(Item=profile_data)
+        _PROFILE_CACHE.pop((accountId, profile_data['profileId']), None)
         
         # Return the created profile
         return {'profile': profile_data}
@@ -454,6 +504,7 @@ def handle_update_profile(data: Dict[str, Any]) -> Dict[str, Any]:
         
         # Update the profile in DynamoDB
         table.put_item(Item=updated_profile)
+        _PROFILE_CACHE.pop((accountId, profileId), None)
         
         # Return the updated profile
         return {'profile': updated_profile}
@@ -494,6 +545,7 @@ def handle_delete_profile(data: Dict[str, Any]) -> Dict[str, Any]:
                 'profileId': profileId
             }
         )
+        _PROFILE_CACHE.pop((accountId, profileId), None)
         
         # Return success
         return {'message': f'Profile {profileId} deleted successfully'}
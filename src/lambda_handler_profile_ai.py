@@ -5,37 +5,136 @@ It provides functionality to manage AI preferences, recommendation settings, and
 """
 import json
 import os
+import time
 import boto3
-from datetime import datetime
-from typing import Dict, Any, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library when orjson isn't packaged
+    orjson = None
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialize DynamoDB Decimal values, which neither json nor orjson handle natively"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson:
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=_json_default).decode()
+    json_loads = orjson.loads
+else:
+    def json_dumps(obj: Any) -> str:
+        return json.dumps(obj, default=_json_default)
+    json_loads = json.loads
+
+_UTC = timezone.utc
 
 # Initialize AWS resources
-dynamodb = boto3.resource('dynamodb')
+# Keep connections alive between warm invocations and fail fast on slow calls
+_boto_config = Config(
+    tcp_keepalive=True,
+    connect_timeout=1,
+    read_timeout=2,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+DAX_ENDPOINT = os.environ.get('DAX_ENDPOINT')  # Optional DynamoDB Accelerator cluster endpoint
+# _ddb is a plain low-level client for calls built from typed attribute values. The resource's
+# meta.client serializes its input itself and would wrap those values a second time.
+if DAX_ENDPOINT:
+    # Reads and writes go through the DAX cluster; writes are write-through so cached items stay current.
+    # amazondax only needs to be packaged when a DAX endpoint is configured.
+    import amazondax
+    dynamodb = amazondax.AmazonDaxClient.resource(endpoints=[DAX_ENDPOINT], config=_boto_config)
+    _ddb = amazondax.AmazonDaxClient(endpoints=[DAX_ENDPOINT], config=_boto_config)
+    # DAX does not serve control-plane calls such as DescribeTable
+    _ddb_control = boto3.client('dynamodb', config=_boto_config)
+else:
+    dynamodb = boto3.resource('dynamodb', config=_boto_config)
+    _ddb = boto3.client('dynamodb', config=_boto_config)
+    _ddb_control = _ddb
+# Secrets Manager is only used by the test operation, so its client is created on first use
+_sm_client = None
+
+# RapidAPI secret cache, reused across warm invocations: secret name -> (fetched_at, key)
+_secret_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+SECRETS_TTL = 300  # seconds
+
+# Feedback entries expire automatically through the table's TTL attribute
+FEEDBACK_RETENTION_SECONDS = 90 * 24 * 60 * 60
+
+# AI preference attributes read when generating recommendations
+RECOMMENDATION_PROJECTION = 'algorithmSettings, preferredGenres, dislikedGenres'
+
+# Serializers for low-level client calls such as BatchGetItem and TransactWriteItems
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+# Upper bound on the concurrent handle_test checks as a whole, in seconds
+HEALTH_CHECK_TIMEOUT = 5
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_LIMIT = 100
+BATCH_MAX_RETRIES = 5
 
 # Environment variables - only those needed for profile AI operations
 ACCOUNT_TABLE = os.environ.get('ACCOUNT_TABLE')  # For account verification
 PROFILE_TABLE = os.environ.get('PROFILE_TABLE')  # For profile verification
 PROFILE_AI_TABLE = os.environ.get('PROFILE_AI_TABLE')  # Core table for this Lambda
+PROFILE_AI_FEEDBACK_TABLE = os.environ.get('PROFILE_AI_FEEDBACK_TABLE')  # Append-only recommendation feedback
 USER_USAGE_TABLE = os.environ.get('USER_USAGE_TABLE')  # For optional usage tracking
 
 # Authentication-related environment variables
 USER_POOL_ID = os.environ.get('USER_POOL_ID')  # For verifying JWT tokens if handling auth directly
 IDENTITY_POOL_ID = os.environ.get('IDENTITY_POOL_ID')  # For client-side authentication
+ADMIN_GROUP = 'admin'  # Cognito group allowed to call the test operation in production
+
+# DynamoDB Table resources, created once per container and reused across invocations
+_profile_ai_table = dynamodb.Table(PROFILE_AI_TABLE) if PROFILE_AI_TABLE else None
+_feedback_table = dynamodb.Table(PROFILE_AI_FEEDBACK_TABLE) if PROFILE_AI_FEEDBACK_TABLE else None
+_usage_table = dynamodb.Table(USER_USAGE_TABLE) if USER_USAGE_TABLE else None
+
+# Background executor for usage tracking writes. They overlap with the rest of the request
+# and are drained before lambda_handler returns, because Lambda freezes the container as
+# soon as the handler returns and queued writes would otherwise stall or be lost.
+_usage_executor = ThreadPoolExecutor(max_workers=2)
+_pending_usage: List[Future] = []
+USAGE_DRAIN_TIMEOUT = 1.0  # seconds
 
 
-def get_rapidapi_key():
-    """Get RapidAPI key from AWS Secrets Manager"""
+def _get_secrets_client():
+    """Create the Secrets Manager client on first use and reuse it afterwards"""
+    global _sm_client
+    if _sm_client is None:
+        _sm_client = boto3.session.Session().client(service_name='secretsmanager', config=_boto_config)
+    return _sm_client
+
+
+def get_rapidapi_key(force: bool = False):
+    """
+    Get RapidAPI key from AWS Secrets Manager, cached across warm invocations
+    Pass force=True to bypass the cache and fetch the secret again.
+    """
     secret_name = os.environ.get('RAPIDAPI_SECRET_NAME')
     if not secret_name:
         raise ValueError("RAPIDAPI_SECRET_NAME environment variable not set")
     
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(service_name='secretsmanager')
+    # Serve the key from the cache while it is still fresh
+    cached = _secret_cache.get(secret_name)
+    if not force and cached and time.monotonic() - cached[0] < SECRETS_TTL:
+        return cached[1]
     
     try:
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+        get_secret_value_response = _get_secrets_client().get_secret_value(SecretId=secret_name)
     except ClientError as error:
         print(f"Error retrieving secret {secret_name}: {str(error)}")
         raise error
@@ -43,19 +142,162 @@ def get_rapidapi_key():
     # Depending on whether the secret is a string or binary, one of these fields will be populated
     if 'SecretString' in get_secret_value_response:
         secret = get_secret_value_response['SecretString']
-        # Parse the JSON string
-        secret_dict = json.loads(secret)
-        # Return the specific key value
-        return secret_dict.get('rapidapikey')
+        # Parse the JSON string once and cache only the key value
+        secret_dict = json_loads(secret)
+        rapidapi_key = secret_dict.get('rapidapikey')
+        _secret_cache[secret_name] = (time.monotonic(), rapidapi_key)
+        return rapidapi_key
     else:
         raise ValueError("Secret value is not in string format")
 
 
+def _require(data: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    """Return a 400 error for the first missing required parameter, or None if all are present"""
+    for key in keys:
+        if not data.get(key):
+            return {'error': f'Missing required parameter: {key}', 'statusCode': 400}
+    return None
+
+
+def _to_dynamo(value: Any) -> Any:
+    """Replace floats parsed from request JSON with Decimal, which TypeSerializer requires"""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: _to_dynamo(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamo(item) for item in value]
+    return value
+
+
+def _serialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a plain item into DynamoDB attribute values for low-level client calls"""
+    return {key: _serializer.serialize(_to_dynamo(value)) for key, value in item.items()}
+
+
+def _deserialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert DynamoDB attribute values from low-level client calls into plain Python values"""
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+def batch_get_items(table_name: str, keys: List[Dict[str, Any]], projection: Optional[str] = None,
+                    deserialize: bool = True) -> List[Dict[str, Any]]:
+    """
+    Fetch several items from one table with BatchGetItem on the low-level client
+    Sends up to 100 keys per request and retries UnprocessedKeys with exponential backoff.
+    Pass deserialize=False to get raw attribute values when only a key attribute is needed.
+    """
+    items = []
+    serialized_keys = [_serialize_item(key) for key in keys]
+    for start in range(0, len(serialized_keys), BATCH_GET_LIMIT):
+        request = {'Keys': serialized_keys[start:start + BATCH_GET_LIMIT]}
+        if projection:
+            request['ProjectionExpression'] = projection
+        request_items = {table_name: request}
+        
+        attempt = 0
+        while request_items:
+            response = _ddb.batch_get_item(RequestItems=request_items)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+            if request_items:
+                if attempt >= BATCH_MAX_RETRIES:
+                    raise RuntimeError(f"Unprocessed keys remain for table {table_name} after {attempt} retries")
+                time.sleep(0.05 * (2 ** attempt))
+                attempt += 1
+    
+    if deserialize:
+        return [_deserialize_item(item) for item in items]
+    return items
+
+
+def _put_usage_item(item: Dict[str, Any]) -> None:
+    """Write a usage record, logging rather than raising on failure"""
+    try:
+        _usage_table.put_item(Item=item)
+    except Exception as e:
+        print(f"Error recording usage: {str(e)}")
+
+
+def _log_usage_failure(future: Future) -> None:
+    """Done-callback: log a usage write that raised instead of dropping it silently"""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Error recording usage: {str(future.exception())}")
+
+
+def record_usage(item: Dict[str, Any]) -> None:
+    """
+    Queue a usage record write on the background executor
+    The caller doesn't wait on the DynamoDB round-trip; drain_usage_writes does at the end of the request.
+    """
+    if _usage_table is None:
+        return
+    future = _usage_executor.submit(_put_usage_item, item)
+    future.add_done_callback(_log_usage_failure)
+    _pending_usage.append(future)
+
+
+def drain_usage_writes() -> None:
+    """Wait briefly for queued usage writes so they finish before the container is frozen"""
+    if not _pending_usage:
+        return
+    _, not_done = wait(_pending_usage, timeout=USAGE_DRAIN_TIMEOUT)
+    if not_done:
+        print(f"WARNING: {len(not_done)} usage write(s) still pending after {USAGE_DRAIN_TIMEOUT}s")
+    _pending_usage.clear()
+
+
+def _check_table(table_name: str, table_var: Optional[str]) -> Tuple[Dict[str, Any], Optional[str], Optional[str]]:
+    """Describe one table for handle_test, returning (status, message, warning)"""
+    if not table_var:
+        return (
+            {'status': 'not_configured', 'error': 'Environment variable not set'},
+            None,
+            f"Table {table_name} not configured (missing env variable)"
+        )
+    
+    try:
+        # DescribeTable's ItemCount is refreshed by DynamoDB roughly every six hours,
+        # which is accurate enough for diagnostics and avoids scanning the table
+        table_details = _ddb_control.describe_table(TableName=table_var)
+        item_count = table_details['Table'].get('ItemCount', 'unknown')
+        return (
+            {'status': 'accessible', 'name': table_var, 'item_count': item_count},
+            f"Table {table_var} contains {item_count} items",
+            None
+        )
+    except ClientError as e:
+        return (
+            {'status': 'error', 'name': table_var, 'error': str(e)},
+            None,
+            f"Error accessing table {table_var}: {str(e)}"
+        )
+
+
+def _check_rapidapi_key() -> Tuple[Optional[str], Optional[str]]:
+    """Check the RapidAPI key for handle_test, returning (message, warning)"""
+    # Health checks can skip this, and a cached key is reported as-is
+    if os.environ.get('SKIP_SECRET_CHECK') == '1':
+        return "RapidAPI key check skipped (SKIP_SECRET_CHECK is set)", None
+    
+    cached = _secret_cache.get(os.environ.get('RAPIDAPI_SECRET_NAME', ''))
+    cache_age = time.monotonic() - cached[0] if cached else None
+    try:
+        _ = get_rapidapi_key()
+    except Exception as e:
+        return None, f"Cannot access RapidAPI key: {str(e)}"
+    
+    if cache_age is not None and cache_age < SECRETS_TTL:
+        return f"RapidAPI key is accessible (cached {cache_age:.0f}s ago)", None
+    return "RapidAPI key is accessible", None
+
+
 def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     """Test handler for API connectivity and diagnostics"""
     # Get the Lambda function name from the context
     function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'unknown')
     environment = os.environ.get('ENVIRONMENT', 'unknown')
+    now_iso = datetime.now(_UTC).isoformat()
     
     # Check if we can access DynamoDB tables
     table_status = {}
@@ -64,43 +306,50 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     
     # Check for required environment variables
     for env_var in [
-        'ACCOUNTS_TABLE', 'PROFILE_TABLE', 'PROFILE_AI_TABLE',
+        'ACCOUNT_TABLE', 'PROFILE_TABLE', 'PROFILE_AI_TABLE', 'PROFILE_AI_FEEDBACK_TABLE',
         'USER_USAGE_TABLE', 'RAPIDAPI_SECRET_NAME', 'ENVIRONMENT',
         'USER_POOL_ID', 'IDENTITY_POOL_ID'
     ]:
         if not os.environ.get(env_var):
             warnings.append(f"Environment variable {env_var} not configured")
     
-    # Check all tables
-    for table_name, table_var in {
-        'ACCOUNT_TABLE': ACCOUNT_TABLE,
-        'PROFILE_TABLE': PROFILE_TABLE,
-        'PROFILE_AI_TABLE': PROFILE_AI_TABLE,
-        'USER_USAGE_TABLE': USER_USAGE_TABLE,
-    }.items():
-        if table_var:
+    # Check all tables and the RapidAPI key concurrently - the calls are independent
+    # and boto3 clients are thread-safe
+    tables = [
+        ('ACCOUNT_TABLE', ACCOUNT_TABLE),
+        ('PROFILE_TABLE', PROFILE_TABLE),
+        ('PROFILE_AI_TABLE', PROFILE_AI_TABLE),
+        ('PROFILE_AI_FEEDBACK_TABLE', PROFILE_AI_FEEDBACK_TABLE),
+        ('USER_USAGE_TABLE', USER_USAGE_TABLE),
+    ]
+    # Don't wait on the pool when leaving: a hung check must not hold the response past the deadline
+    executor = ThreadPoolExecutor(max_workers=len(tables) + 1)
+    deadline = time.monotonic() + HEALTH_CHECK_TIMEOUT
+    try:
+        table_futures = [
+            (table_name, executor.submit(_check_table, table_name, table_var))
+            for table_name, table_var in tables
+        ]
+        secret_future = executor.submit(_check_rapidapi_key)
+        
+        # Collect in submission order so the report stays stable between calls
+        for table_name, future in table_futures:
             try:
-                table = dynamodb.Table(table_var)
-                item_count = table.scan(Select='COUNT')['Count']
-                table_status[table_name] = {
-                    'status': 'accessible',
-                    'name': table_var,
-                    'item_count': item_count
-                }
-                messages.append(f"Table {table_var} contains {item_count} items")
-            except ClientError as e:
-                table_status[table_name] = {
-                    'status': 'error',
-                    'name': table_var,
-                    'error': str(e)
-                }
-                warnings.append(f"Error accessing table {table_var}: {str(e)}")
-        else:
-            table_status[table_name] = {
-                'status': 'not_configured',
-                'error': 'Environment variable not set'
-            }
-            warnings.append(f"Table {table_name} not configured (missing env variable)")
+                status, message, warning = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                status = {'status': 'error', 'error': 'Check timed out'}
+                message, warning = None, f"Timed out checking table {table_name}"
+            table_status[table_name] = status
+            if message:
+                messages.append(message)
+            if warning:
+                warnings.append(warning)
+        try:
+            secret_message, secret_warning = secret_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            secret_message, secret_warning = None, "Timed out checking RapidAPI key"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     
     # Check infrastructure resources
     parameter_status = {}
@@ -115,20 +364,18 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
             'error': 'Environment variable not set'
         }
     
-    # Check for RapidAPI key
-    try:
-        _ = get_rapidapi_key()
-        messages.append("RapidAPI key is accessible")
-    except Exception as e:
-        warnings.append(f"Cannot access RapidAPI key: {str(e)}")
+    if secret_message:
+        messages.append(secret_message)
+    if secret_warning:
+        warnings.append(secret_warning)
     
     # Get Lambda execution environment
     execution_env = os.environ.get('AWS_EXECUTION_ENV', 'unknown')
     
     return {
         'message': 'MyAI4 Profile AI API is operational',
-        'timestamp': datetime.utcnow().isoformat(),
-        'request_time': datetime.utcnow().isoformat(),
+        'timestamp': now_iso,
+        'request_time': now_iso,
         'data_received': data,
         'function': function_name,
         'lambda_name': function_name,
@@ -145,6 +392,16 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def is_admin_request(event: Dict[str, Any]) -> bool:
+    """Check whether the Cognito claims passed through by API Gateway include the admin group"""
+    authorizer = (event.get('requestContext') or {}).get('authorizer') or {}
+    groups = (authorizer.get('claims') or {}).get('cognito:groups', '')
+    if isinstance(groups, str):
+        # API Gateway flattens list claims into strings such as "[admin, viewers]"
+        groups = groups.strip('[]').replace(',', ' ').split()
+    return ADMIN_GROUP in groups
+
+
 def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """Create an API Gateway response object"""
     return {
@@ -155,7 +412,7 @@ def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
             'Access-Control-Allow-Headers': 'Content-Type,Authorization',
             'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
         },
-        'body': json.dumps(body)
+        'body': json_dumps(body)
     }
 
 
@@ -181,7 +438,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             # For other HTTP methods, look for operation in body
             body = event.get('body', '{}')
             if isinstance(body, str):
-                body_json = json.loads(body)
+                body_json = json_loads(body)
             else:
                 body_json = body
                 
@@ -191,22 +448,15 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not operation:
             return create_response(400, {'error': 'Missing operation parameter'})
             
+        # Diagnostics expose table details, so restrict them to admins in production
+        if operation == 'test' and os.environ.get('ENVIRONMENT') == 'prod' and not is_admin_request(event):
+            return create_response(403, {'error': 'The test operation requires the admin role'})
+            
         # Route to appropriate handler
-        if operation == 'test':
-            result = handle_test(data)
-        elif operation == 'getAiPreferences':
-            result = handle_get_ai_preferences(data)
-        elif operation == 'updateAiPreferences':
-            result = handle_update_ai_preferences(data)
-        elif operation == 'generateRecommendations':
-            result = handle_generate_recommendations(data)
-        elif operation == 'provideRecommendationFeedback':
-            result = handle_provide_recommendation_feedback(data)
-        elif operation == 'getGroupRecommendations':
-            result = handle_get_group_recommendations(data)
-        else:
-            result = {'error': f"Unknown operation: {operation}"}
-            return create_response(400, result)
+        handler = _HANDLERS.get(operation)
+        if handler is None:
+            return create_response(400, {'error': f"Unknown operation: {operation}"})
+        result = handler(data)
         
         if result.get('statusCode'):
             # If result already has a statusCode, use it
@@ -223,6 +473,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'error': 'Internal server error',
             'details': error_message
         })
+    finally:
+        drain_usage_writes()
 
 
 def handle_get_ai_preferences(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -235,10 +487,9 @@ def handle_get_ai_preferences(data: Dict[str, Any]) -> Dict[str, Any]:
     - profileId (required): The ID of the profile to retrieve AI preferences for
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -247,21 +498,9 @@ def handle_get_ai_preferences(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile AI table not configured', 'statusCode': 500}
     
     try:
-        # Check if profile exists first
-        if PROFILE_TABLE:
-            profile_table = dynamodb.Table(PROFILE_TABLE)
-            profile_response = profile_table.get_item(
-                Key={
-                    'accountId': accountId,
-                    'profileId': profileId
-                }
-            )
-            if 'Item' not in profile_response:
-                return {'error': 'Profile not found', 'statusCode': 404}
-        
-        # Get AI preferences
-        ai_table = dynamodb.Table(PROFILE_AI_TABLE)
-        response = ai_table.get_item(
+        # Get AI preferences - no separate profile existence check, since a missing
+        # profile has no AI preferences row and simply receives the defaults below
+        response = _profile_ai_table.get_item(
             Key={
                 'accountId': accountId,
                 'profileId': profileId
@@ -289,7 +528,7 @@ def handle_get_ai_preferences(data: Dict[str, Any]) -> Dict[str, Any]:
                 'dislikedGenres': [],
                 'favoriteActors': [],
                 'favoriteDirectors': [],
-                'createdAt': datetime.utcnow().isoformat()
+                'createdAt': datetime.now(_UTC).isoformat()
             }
             
             return {
@@ -323,12 +562,9 @@ def handle_update_ai_preferences(data: Dict[str, Any]) -> Dict[str, Any]:
     - preferences (required): The AI preferences object to update
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
-    if not data.get('preferences'):
-        return {'error': 'Missing required parameter: preferences', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId', 'preferences'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -338,27 +574,36 @@ def handle_update_ai_preferences(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile AI table not configured', 'statusCode': 500}
     
     try:
-        # Check if profile exists first
-        if PROFILE_TABLE:
-            profile_table = dynamodb.Table(PROFILE_TABLE)
-            profile_response = profile_table.get_item(
-                Key={
-                    'accountId': accountId,
-                    'profileId': profileId
-                }
-            )
-            if 'Item' not in profile_response:
-                return {'error': 'Profile not found', 'statusCode': 404}
-        
-        # Update AI preferences
-        ai_table = dynamodb.Table(PROFILE_AI_TABLE)
-        
-        # Add timestamp and required keys
-        preferences['updatedAt'] = datetime.utcnow().isoformat()
+        # Update AI preferences - add timestamp and required keys
+        preferences['updatedAt'] = datetime.now(_UTC).isoformat()
         preferences['accountId'] = accountId
         preferences['profileId'] = profileId
         
-        response = ai_table.put_item(Item=preferences)
+        if PROFILE_TABLE:
+            # Check the profile exists and write the preferences in a single transaction
+            try:
+                _ddb.transact_write_items(TransactItems=[
+                    {
+                        'ConditionCheck': {
+                            'TableName': PROFILE_TABLE,
+                            'Key': _serialize_item({'accountId': accountId, 'profileId': profileId}),
+                            'ConditionExpression': 'attribute_exists(profileId)'
+                        }
+                    },
+                    {
+                        'Put': {
+                            'TableName': PROFILE_AI_TABLE,
+                            'Item': _serialize_item(preferences)
+                        }
+                    }
+                ])
+            except ClientError as e:
+                reasons = e.response.get('CancellationReasons') or []
+                if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                    return {'error': 'Profile not found', 'statusCode': 404}
+                raise
+        else:
+            _profile_ai_table.put_item(Item=preferences)
         
         return {
             'message': 'AI preferences updated successfully',
@@ -396,10 +641,9 @@ def handle_generate_recommendations(data: Dict[str, Any]) -> Dict[str, Any]:
     - filters (optional): Additional filters for recommendations
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -410,13 +654,13 @@ def handle_generate_recommendations(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile AI table not configured', 'statusCode': 500}
     
     try:
-        # Get AI preferences
-        ai_table = dynamodb.Table(PROFILE_AI_TABLE)
-        response = ai_table.get_item(
+        # Get AI preferences - only the settings used for recommendations, not the feedback history
+        response = _profile_ai_table.get_item(
             Key={
                 'accountId': accountId,
                 'profileId': profileId
-            }
+            },
+            ProjectionExpression=RECOMMENDATION_PROJECTION
         )
         
         # Default preferences if none found
@@ -437,32 +681,29 @@ def handle_generate_recommendations(data: Dict[str, Any]) -> Dict[str, Any]:
         
         # In a real implementation, this would call an AI/ML service to generate recommendations
         # For demo purposes, we'll return mock recommendations
-        mock_recommendations = [
-            {
-                'movieId': f'movie{i}',
-                'title': f'Recommended Movie {i}',
+        # The explanation is the same for every item, so build it once
+        preferred_genres = preferences.get('preferredGenres') or ['popular']
+        explanation = f'Based on your preference for {preferred_genres[0]} movies'
+        mock_recommendations = []
+        for i in range(1, count + 1):
+            i_str = str(i)
+            mock_recommendations.append({
+                'movieId': 'movie' + i_str,
+                'title': 'Recommended Movie ' + i_str,
                 'score': round(0.95 - (i * 0.05), 2),
                 'reasonCode': 'GENRE_MATCH',
-                'explanation': f'Based on your preference for {preferences.get("preferredGenres", ["action"])[0] if preferences.get("preferredGenres") else "popular"} movies'
-            }
-            for i in range(1, count + 1)
-        ]
+                'explanation': explanation
+            })
         
-        # Track usage (simplified)
-        if USER_USAGE_TABLE:
-            try:
-                usage_table = dynamodb.Table(USER_USAGE_TABLE)
-                timestamp = datetime.utcnow().isoformat()
-                usage_table.put_item(Item={
-                    'accountId': accountId,
-                    'timestamp': timestamp,
-                    'serviceType': 'streaming',
-                    'operation': 'generateRecommendations',
-                    'profileId': profileId,
-                    'count': count
-                })
-            except Exception as e:
-                print(f"Error recording usage: {str(e)}")
+        # Track usage (simplified) - written in the background so it doesn't delay the response
+        record_usage({
+            'accountId': accountId,
+            'timestamp': datetime.now(_UTC).isoformat(),
+            'serviceType': 'streaming',
+            'operation': 'generateRecommendations',
+            'profileId': profileId,
+            'count': count
+        })
         
         return {
             'recommendations': mock_recommendations,
@@ -502,73 +743,33 @@ def handle_provide_recommendation_feedback(data: Dict[str, Any]) -> Dict[str, An
     - feedback (required): The feedback object (liked: boolean, rating: number, reason: string)
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
-    if not data.get('movieId'):
-        return {'error': 'Missing required parameter: movieId', 'statusCode': 400}
-    if not data.get('feedback'):
-        return {'error': 'Missing required parameter: feedback', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId', 'movieId', 'feedback'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
     movieId = data['movieId']
     feedback = data['feedback']
     
-    if not PROFILE_AI_TABLE:
-        return {'error': 'Profile AI table not configured', 'statusCode': 500}
+    if not PROFILE_AI_FEEDBACK_TABLE:
+        return {'error': 'Profile AI feedback table not configured', 'statusCode': 500}
     
     try:
-        # Get AI preferences
-        ai_table = dynamodb.Table(PROFILE_AI_TABLE)
-        response = ai_table.get_item(
-            Key={
-                'accountId': accountId,
-                'profileId': profileId
-            }
-        )
+        now = datetime.now(_UTC)
+        now_iso = now.isoformat()
         
-        # Initialize or get existing preferences
-        if 'Item' in response:
-            preferences = response['Item']
-        else:
-            preferences = {
-                'accountId': accountId,
-                'profileId': profileId,
-                'algorithmSettings': {
-                    'explainability': 'detailed',
-                    'surpriseLevel': 'medium',
-                    'diversityLevel': 'medium',
-                    'noveltyWeight': 0.5,
-                    'popularityWeight': 0.5
-                },
-                'preferredGenres': [],
-                'dislikedGenres': [],
-                'createdAt': datetime.utcnow().isoformat()
-            }
-        
-        # Initialize feedback history if it doesn't exist
-        if 'feedbackHistory' not in preferences:
-            preferences['feedbackHistory'] = []
-        
-        # Add new feedback with timestamp
-        feedback_entry = {
+        # Append the feedback as its own item - no read-modify-write of the preferences item
+        _feedback_table.put_item(Item={
+            'pk': f'{accountId}#{profileId}',
+            'sk': f'{now_iso}#{movieId}',
+            'accountId': accountId,
+            'profileId': profileId,
             'movieId': movieId,
-            'timestamp': datetime.utcnow().isoformat(),
-            'feedback': feedback
-        }
-        
-        # Add to feedback history (keep only last 50 entries)
-        preferences['feedbackHistory'].insert(0, feedback_entry)
-        if len(preferences['feedbackHistory']) > 50:
-            preferences['feedbackHistory'] = preferences['feedbackHistory'][:50]
-        
-        # Update last modified timestamp
-        preferences['updatedAt'] = datetime.utcnow().isoformat()
-        
-        # Save updated preferences
-        ai_table.put_item(Item=preferences)
+            'timestamp': now_iso,
+            'feedback': feedback,
+            'expiresAt': int(now.timestamp()) + FEEDBACK_RETENTION_SECONDS
+        })
         
         # In a real implementation, we might also update a machine learning model here
         
@@ -604,8 +805,9 @@ def handle_get_group_recommendations(data: Dict[str, Any]) -> Dict[str, Any]:
     - count (optional): The number of recommendations to generate (default: 10)
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
+    error = _require(data, ('accountId',))
+    if error:
+        return error
     if not data.get('profileIds') or not isinstance(data.get('profileIds'), list):
         return {'error': 'Missing required parameter: profileIds (must be an array)', 'statusCode': 400}
     
@@ -617,33 +819,32 @@ def handle_get_group_recommendations(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile AI table not configured', 'statusCode': 500}
     
     try:
+        # BatchGetItem rejects duplicate keys, so request each profile once
+        keys = [
+            {'accountId': accountId, 'profileId': profile_id}
+            for profile_id in dict.fromkeys(profile_ids)
+        ]
+        
         # Verify all profiles exist and belong to the account
         if PROFILE_TABLE:
-            profile_table = dynamodb.Table(PROFILE_TABLE)
+            found_ids = {
+                item['profileId']['S']
+                for item in batch_get_items(PROFILE_TABLE, keys, projection='profileId', deserialize=False)
+            }
             for profile_id in profile_ids:
-                profile_response = profile_table.get_item(
-                    Key={
-                        'accountId': accountId,
-                        'profileId': profile_id
-                    }
-                )
-                if 'Item' not in profile_response:
+                if profile_id not in found_ids:
                     return {'error': f'Profile {profile_id} not found', 'statusCode': 404}
         
         # Get AI preferences for all profiles
-        ai_table = dynamodb.Table(PROFILE_AI_TABLE)
+        preferences_by_id = {
+            item['profileId']: item
+            for item in batch_get_items(PROFILE_AI_TABLE, keys, projection='profileId, ' + RECOMMENDATION_PROJECTION)
+        }
         all_preferences = []
         
         for profile_id in profile_ids:
-            response = ai_table.get_item(
-                Key={
-                    'accountId': accountId,
-                    'profileId': profile_id
-                }
-            )
-            
-            if 'Item' in response:
-                all_preferences.append(response['Item'])
+            if profile_id in preferences_by_id:
+                all_preferences.append(preferences_by_id[profile_id])
             else:
                 # Use default preferences if none found
                 all_preferences.append({
@@ -660,32 +861,28 @@ def handle_get_group_recommendations(data: Dict[str, Any]) -> Dict[str, Any]:
         
         # In a real implementation, this would perform a complex algorithm that balances preferences
         # For demo purposes, we'll return mock recommendations
-        mock_recommendations = [
-            {
-                'movieId': f'movie{i}',
-                'title': f'Group Recommendation {i}',
+        # Match scores only depend on i % 3, so precompute the three possible values
+        match_by_remainder = [round(0.7 + (0.2 * remainder), 2) for remainder in range(3)]
+        mock_recommendations = []
+        for i in range(1, count + 1):
+            i_str = str(i)
+            mock_recommendations.append({
+                'movieId': 'movie' + i_str,
+                'title': 'Group Recommendation ' + i_str,
                 'score': round(0.95 - (i * 0.05), 2),
-                'matchScores': {profile_id: round(0.7 + (0.2 * (i % 3)), 2) for profile_id in profile_ids},
+                'matchScores': dict.fromkeys(profile_ids, match_by_remainder[i % 3]),
                 'explanation': 'Recommended based on combined group preferences'
-            }
-            for i in range(1, count + 1)
-        ]
+            })
         
-        # Track usage (simplified)
-        if USER_USAGE_TABLE:
-            try:
-                usage_table = dynamodb.Table(USER_USAGE_TABLE)
-                timestamp = datetime.utcnow().isoformat()
-                usage_table.put_item(Item={
-                    'accountId': accountId,
-                    'timestamp': timestamp,
-                    'serviceType': 'streaming',
-                    'operation': 'getGroupRecommendations',
-                    'profileIds': profile_ids,
-                    'count': count
-                })
-            except Exception as e:
-                print(f"Error recording usage: {str(e)}")
+        # Track usage (simplified) - written in the background so it doesn't delay the response
+        record_usage({
+            'accountId': accountId,
+            'timestamp': datetime.now(_UTC).isoformat(),
+            'serviceType': 'streaming',
+            'operation': 'getGroupRecommendations',
+            'profileIds': profile_ids,
+            'count': count
+        })
         
         return {
             'recommendations': mock_recommendations,
@@ -707,3 +904,14 @@ def handle_get_group_recommendations(data: Dict[str, Any]) -> Dict[str, Any]:
             'details': str(e),
             'statusCode': 500
         }
+
+
+# Operation routing table used by lambda_handler
+_HANDLERS = {
+    'test': handle_test,
+    'getAiPreferences': handle_get_ai_preferences,
+    'updateAiPreferences': handle_update_ai_preferences,
+    'generateRecommendations': handle_generate_recommendations,
+    'provideRecommendationFeedback': handle_provide_recommendation_feedback,
+    'getGroupRecommendations': handle_get_group_recommendations
+}
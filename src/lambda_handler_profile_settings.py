@@ -3,15 +3,98 @@ MyAI4 Profile Settings Lambda Handler
 This Lambda function handles profile settings operations for the myAI4 platform.
 It provides functionality to manage profile settings, including content restrictions and PIN protection.
 """
+import hashlib
+import hmac
 import json
 import os
+import secrets
+import time
 import boto3
-from datetime import datetime
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from decimal import Decimal
+from types import MappingProxyType
 
-# Initialize AWS resources
-dynamodb = boto3.resource('dynamodb')
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library when orjson isn't packaged
+    orjson = None
+
+
+def _json_default(obj: Any) -> Any:
+    """
+    Serialize DynamoDB Decimal values, which neither json nor orjson handle natively,
+    and datetimes for the json fallback (orjson writes them itself in the same format)
+    """
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson:
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=_json_default).decode()
+    json_loads = orjson.loads
+else:
+    def json_dumps(obj: Any) -> str:
+        return json.dumps(obj, default=_json_default)
+    json_loads = json.loads
+
+_UTC = timezone.utc
+
+# Initialize AWS resources at import so a SnapStart snapshot captures them.
+# Nothing here holds secrets or per-request state, and connections reopen after restore.
+# Keep connections alive and pooled between warm invocations
+_boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'standard'}
+)
+dynamodb = boto3.resource('dynamodb', config=_boto_config)
+# Plain low-level client for calls built from typed attribute values. The resource's
+# meta.client serializes its input itself and would wrap those values a second time.
+_ddb = boto3.client('dynamodb', config=_boto_config)
+_sm_client = None  # Secrets Manager client, created on first use by _get_secrets_client
+
+# RapidAPI secret cache, reused across warm invocations: secret name -> (fetched_at, key)
+_secret_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+SECRETS_TTL = 600  # seconds
+
+# Serializers for low-level client calls such as BatchGetItem and TransactWriteItems
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+BATCH_MAX_RETRIES = 5
+
+# scrypt parameters for PIN hashing; stored hashes have the form scrypt$<salt hex>$<hash hex>
+PIN_SALT_BYTES = 16
+PIN_SCRYPT_PARAMS = {'n': 2 ** 14, 'r': 8, 'p': 1, 'dklen': 32}
+
+# Upper bound on the concurrent handle_test checks as a whole, in seconds
+HEALTH_CHECK_TIMEOUT = 5
+
+# Content restrictions applied when a profile has no custom settings.
+# Read-only; copy with dict() wherever the value is returned or serialized.
+DEFAULT_RESTRICTIONS = MappingProxyType({
+    'maxRating': 'PG-13',
+    'blockedGenres': [],
+    'blockedTitles': [],
+    'blockedActors': [],
+    'blockedDirectors': []
+})
+
+# Response headers shared by every API Gateway response
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',  # For CORS support
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
 
 # Environment variables - only those needed for profile settings operations
 ACCOUNT_TABLE = os.environ.get('ACCOUNT_TABLE')  # For account verification
@@ -23,19 +106,133 @@ USER_USAGE_TABLE = os.environ.get('USER_USAGE_TABLE')  # For optional usage trac
 USER_POOL_ID = os.environ.get('USER_POOL_ID')  # For verifying JWT tokens if handling auth directly
 IDENTITY_POOL_ID = os.environ.get('IDENTITY_POOL_ID')  # For client-side authentication
 
+# DynamoDB Table resource, created once per container and reused across invocations
+_settings_table = dynamodb.Table(PROFILE_SETTINGS_TABLE) if PROFILE_SETTINGS_TABLE else None
+
+
+def _require(data: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    """Return a 400 error for the first missing required parameter, or None if all are present"""
+    for key in keys:
+        if not data.get(key):
+            return {'error': f'Missing required parameter: {key}', 'statusCode': 400}
+    return None
+
+
+def _profile_key(accountId: str, profileId: str) -> Dict[str, Any]:
+    """Build the accountId/profileId key in low-level client attribute value format"""
+    return {'accountId': {'S': accountId}, 'profileId': {'S': profileId}}
+
+
+def _to_dynamo(value: Any) -> Any:
+    """Replace floats parsed from request JSON with Decimal, which TypeSerializer requires"""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: _to_dynamo(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamo(item) for item in value]
+    return value
+
+
+def _serialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a plain item into DynamoDB attribute values for low-level client calls"""
+    return {key: _serializer.serialize(_to_dynamo(value)) for key, value in item.items()}
+
+
+def _deserialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert DynamoDB attribute values from low-level client calls into plain Python values"""
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+def batch_get(request_items: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run a BatchGetItem request on the low-level client and return the raw items per table
+    UnprocessedKeys are retried with exponential backoff.
+    """
+    responses: Dict[str, List[Dict[str, Any]]] = {}
+    attempt = 0
+    while request_items:
+        response = _ddb.batch_get_item(RequestItems=request_items)
+        for table_name, items in response.get('Responses', {}).items():
+            responses.setdefault(table_name, []).extend(items)
+        request_items = response.get('UnprocessedKeys') or {}
+        if request_items:
+            if attempt >= BATCH_MAX_RETRIES:
+                raise RuntimeError(f"Unprocessed keys remain after {attempt} retries")
+            time.sleep(0.05 * (2 ** attempt))
+            attempt += 1
+    return responses
+
+
+def _hash_pin(pin: Any, salt: Optional[bytes] = None) -> str:
+    """Hash a PIN with scrypt and a random salt, returning the encoded value to store"""
+    if salt is None:
+        salt = secrets.token_bytes(PIN_SALT_BYTES)
+    digest = hashlib.scrypt(str(pin).encode(), salt=salt, **PIN_SCRYPT_PARAMS)
+    return f"scrypt${salt.hex()}${digest.hex()}"
+
+
+def _is_legacy_pin_hash(stored_hash: str) -> bool:
+    """Whether a stored PIN predates scrypt hashing and still uses the hashed_<pin>_value form"""
+    return stored_hash.startswith('hashed_') and stored_hash.endswith('_value')
+
+
+def _verify_pin(pin: Any, stored_hash: str) -> bool:
+    """Check a PIN against a stored hash (scrypt or legacy format) in constant time"""
+    if _is_legacy_pin_hash(stored_hash):
+        return hmac.compare_digest(f"hashed_{pin}_value".encode(), stored_hash.encode())
+    try:
+        scheme, salt_hex, _ = stored_hash.split('$')
+        salt = bytes.fromhex(salt_hex)
+    except ValueError:
+        return False
+    if scheme != 'scrypt':
+        return False
+    return hmac.compare_digest(_hash_pin(pin, salt), stored_hash)
+
+
+def _upgrade_pin_hash(accountId: str, profileId: str, pin: Any, legacy_hash: str) -> None:
+    """
+    Replace a verified legacy PIN hash with scrypt
+    The write is conditional on the legacy value so a concurrent PIN change is not overwritten,
+    and failures are only logged because the PIN has already been verified.
+    """
+    try:
+        _ddb.update_item(
+            TableName=PROFILE_SETTINGS_TABLE,
+            Key=_profile_key(accountId, profileId),
+            UpdateExpression='SET pinHash = :hash',
+            ConditionExpression='pinHash = :legacy',
+            ExpressionAttributeValues={
+                ':hash': {'S': _hash_pin(pin)},
+                ':legacy': {'S': legacy_hash}
+            }
+        )
+    except ClientError as e:
+        print(f"Could not upgrade legacy PIN hash for profile {profileId}: {str(e)}")
+
+
+def _get_secrets_client():
+    """Create the Secrets Manager client on first use and reuse it afterwards"""
+    global _sm_client
+    if _sm_client is None:
+        _sm_client = boto3.client('secretsmanager', config=_boto_config)
+    return _sm_client
+
 
 def get_rapidapi_key():
-    """Get RapidAPI key from AWS Secrets Manager"""
+    """Get RapidAPI key from AWS Secrets Manager, cached across warm invocations"""
     secret_name = os.environ.get('RAPIDAPI_SECRET_NAME')
     if not secret_name:
         raise ValueError("RAPIDAPI_SECRET_NAME environment variable not set")
     
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(service_name='secretsmanager')
+    # Serve the key from the cache while it is still fresh
+    cached = _secret_cache.get(secret_name)
+    if cached and time.monotonic() - cached[0] < SECRETS_TTL:
+        return cached[1]
     
     try:
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+        get_secret_value_response = _get_secrets_client().get_secret_value(SecretId=secret_name)
     except ClientError as error:
         print(f"Error retrieving secret {secret_name}: {str(error)}")
         raise error
@@ -43,14 +240,49 @@ def get_rapidapi_key():
     # Depending on whether the secret is a string or binary, one of these fields will be populated
     if 'SecretString' in get_secret_value_response:
         secret = get_secret_value_response['SecretString']
-        # Parse the JSON string
+        # Parse the JSON string once and cache only the key value
         secret_dict = json.loads(secret)
-        # Return the specific key value
-        return secret_dict.get('rapidapikey')
+        rapidapi_key = secret_dict.get('rapidapikey')
+        _secret_cache[secret_name] = (time.monotonic(), rapidapi_key)
+        return rapidapi_key
     else:
         raise ValueError("Secret value is not in string format")
 
 
+def _check_table(table_name: str, table_var: Optional[str]) -> Tuple[Dict[str, Any], Optional[str], Optional[str]]:
+    """Describe one table for handle_test, returning (status, message, warning)"""
+    if not table_var:
+        return (
+            {'status': 'not_configured', 'error': 'Environment variable not set'},
+            None,
+            f"Table {table_name} not configured (missing env variable)"
+        )
+    
+    try:
+        # DescribeTable is a metadata call that consumes no read capacity
+        item_count = _ddb.describe_table(TableName=table_var)['Table'].get('ItemCount', 'unknown')
+        return (
+            {'status': 'accessible', 'name': table_var, 'item_count': item_count},
+            f"Table {table_var} contains approximately {item_count} items (updated roughly every 6 hours)",
+            None
+        )
+    except ClientError as e:
+        return (
+            {'status': 'error', 'name': table_var, 'error': str(e)},
+            None,
+            f"Error accessing table {table_var}: {str(e)}"
+        )
+
+
+def _check_rapidapi_key() -> Tuple[Optional[str], Optional[str]]:
+    """Check the RapidAPI key for handle_test, returning (message, warning)"""
+    try:
+        _ = get_rapidapi_key()
+        return "RapidAPI key is accessible", None
+    except Exception as e:
+        return None, f"Cannot access RapidAPI key: {str(e)}"
+
+
 def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     """Test handler for API connectivity and diagnostics"""
     # Get the Lambda function name from the context
@@ -71,36 +303,42 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
         if not os.environ.get(env_var):
             warnings.append(f"Environment variable {env_var} not configured")
     
-    # Check all tables
-    for table_name, table_var in {
-        'ACCOUNT_TABLE': ACCOUNT_TABLE,
-        'PROFILE_TABLE': PROFILE_TABLE,
-        'PROFILE_SETTINGS_TABLE': PROFILE_SETTINGS_TABLE,
-        'USER_USAGE_TABLE': USER_USAGE_TABLE,
-    }.items():
-        if table_var:
+    # Check all tables and the RapidAPI key concurrently - the calls are independent
+    # and boto3 clients are thread-safe
+    tables = [
+        ('ACCOUNT_TABLE', ACCOUNT_TABLE),
+        ('PROFILE_TABLE', PROFILE_TABLE),
+        ('PROFILE_SETTINGS_TABLE', PROFILE_SETTINGS_TABLE),
+        ('USER_USAGE_TABLE', USER_USAGE_TABLE),
+    ]
+    # Don't wait on the pool when leaving: a hung check must not hold the response past the deadline
+    executor = ThreadPoolExecutor(max_workers=len(tables) + 1)
+    deadline = time.monotonic() + HEALTH_CHECK_TIMEOUT
+    try:
+        table_futures = [
+            (table_name, executor.submit(_check_table, table_name, table_var))
+            for table_name, table_var in tables
+        ]
+        secret_future = executor.submit(_check_rapidapi_key)
+        
+        # Collect in submission order so the report stays stable between calls
+        for table_name, future in table_futures:
             try:
-                table = dynamodb.Table(table_var)
-                item_count = table.scan(Select='COUNT')['Count']
-                table_status[table_name] = {
-                    'status': 'accessible',
-                    'name': table_var,
-                    'item_count': item_count
-                }
-                messages.append(f"Table {table_var} contains {item_count} items")
-            except ClientError as e:
-                table_status[table_name] = {
-                    'status': 'error',
-                    'name': table_var,
-                    'error': str(e)
-                }
-                warnings.append(f"Error accessing table {table_var}: {str(e)}")
-        else:
-            table_status[table_name] = {
-                'status': 'not_configured',
-                'error': 'Environment variable not set'
-            }
-            warnings.append(f"Table {table_name} not configured (missing env variable)")
+                status, message, warning = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                status = {'status': 'error', 'error': 'Check timed out'}
+                message, warning = None, f"Timed out checking table {table_name}"
+            table_status[table_name] = status
+            if message:
+                messages.append(message)
+            if warning:
+                warnings.append(warning)
+        try:
+            secret_message, secret_warning = secret_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            secret_message, secret_warning = None, "Timed out checking RapidAPI key"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     
     # Check infrastructure resources
     parameter_status = {}
@@ -115,20 +353,20 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
             'error': 'Environment variable not set'
         }
     
-    # Check for RapidAPI key
-    try:
-        _ = get_rapidapi_key()
-        messages.append("RapidAPI key is accessible")
-    except Exception as e:
-        warnings.append(f"Cannot access RapidAPI key: {str(e)}")
+    if secret_message:
+        messages.append(secret_message)
+    if secret_warning:
+        warnings.append(secret_warning)
     
     # Get Lambda execution environment
     execution_env = os.environ.get('AWS_EXECUTION_ENV', 'unknown')
     
+    # Returned as a datetime - json_dumps serializes it without an isoformat() call
+    now = datetime.now(_UTC)
     return {
         'message': 'MyAI4 Profile Settings API is operational',
-        'timestamp': datetime.utcnow().isoformat(),
-        'request_time': datetime.utcnow().isoformat(),
+        'timestamp': now,
+        'request_time': now,
         'data_received': data,
         'function': function_name,
         'lambda_name': function_name,
@@ -149,13 +387,8 @@ def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """Create an API Gateway response object"""
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',  # For CORS support
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-        },
-        'body': json.dumps(body)
+        'headers': CORS_HEADERS,
+        'body': json_dumps(body)
     }
 
 
@@ -181,7 +414,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             # For other HTTP methods, look for operation in body
             body = event.get('body', '{}')
             if isinstance(body, str):
-                body_json = json.loads(body)
+                body_json = json_loads(body)
             else:
                 body_json = body
                 
@@ -192,23 +425,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             return create_response(400, {'error': 'Missing operation parameter'})
             
         # Route to appropriate handler
-        if operation == 'test':
-            result = handle_test(data)
-        elif operation == 'getProfileSettings':
-            result = handle_get_profile_settings(data)
-        elif operation == 'updateProfileSettings':
-            result = handle_update_profile_settings(data)
-        elif operation == 'setProfilePin':
-            result = handle_set_profile_pin(data)
-        elif operation == 'verifyProfilePin':
-            result = handle_verify_profile_pin(data)
-        elif operation == 'getContentRestrictions':
-            result = handle_get_content_restrictions(data)
-        elif operation == 'updateContentRestrictions':
-            result = handle_update_content_restrictions(data)
-        else:
-            result = {'error': f"Unknown operation: {operation}"}
-            return create_response(400, result)
+        handler = _HANDLERS.get(operation)
+        if handler is None:
+            return create_response(400, {'error': f"Unknown operation: {operation}"})
+        result = handler(data)
         
         if result.get('statusCode'):
             # If result already has a statusCode, use it
@@ -237,10 +457,9 @@ def handle_get_profile_settings(data: Dict[str, Any]) -> Dict[str, Any]:
     - profileId (required): The ID of the profile to retrieve settings for
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -249,30 +468,20 @@ def handle_get_profile_settings(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile settings table not configured', 'statusCode': 500}
     
     try:
-        # Check if profile exists first
+        # Check the profile exists and get its settings in one BatchGetItem request
+        key = _profile_key(accountId, profileId)
+        request_items = {PROFILE_SETTINGS_TABLE: {'Keys': [key]}}
         if PROFILE_TABLE:
-            profile_table = dynamodb.Table(PROFILE_TABLE)
-            profile_response = profile_table.get_item(
-                Key={
-                    'accountId': accountId,
-                    'profileId': profileId
-                }
-            )
-            if 'Item' not in profile_response:
-                return {'error': 'Profile not found', 'statusCode': 404}
+            request_items[PROFILE_TABLE] = {'Keys': [key], 'ProjectionExpression': 'profileId'}
+        responses = batch_get(request_items)
         
-        # Get profile settings
-        settings_table = dynamodb.Table(PROFILE_SETTINGS_TABLE)
-        response = settings_table.get_item(
-            Key={
-                'accountId': accountId,
-                'profileId': profileId
-            }
-        )
+        if PROFILE_TABLE and not responses.get(PROFILE_TABLE):
+            return {'error': 'Profile not found', 'statusCode': 404}
         
-        if 'Item' in response:
+        settings_items = responses.get(PROFILE_SETTINGS_TABLE)
+        if settings_items:
             # Don't return PIN data in the response for security
-            settings = response['Item']
+            settings = _deserialize_item(settings_items[0])
             if 'pinHash' in settings:
                 settings['pinProtected'] = True
                 del settings['pinHash']
@@ -288,14 +497,8 @@ def handle_get_profile_settings(data: Dict[str, Any]) -> Dict[str, Any]:
                     'accountId': accountId,
                     'profileId': profileId,
                     'pinProtected': False,
-                    'contentRestrictions': {
-                        'maxRating': 'PG-13',
-                        'blockedGenres': [],
-                        'blockedTitles': [],
-                        'blockedActors': [],
-                        'blockedDirectors': []
-                    },
-                    'createdAt': datetime.utcnow().isoformat()
+                    'contentRestrictions': dict(DEFAULT_RESTRICTIONS),
+                    'createdAt': datetime.now(_UTC).isoformat()
                 },
                 'message': 'Default profile settings retrieved (no custom settings found)'
             }
@@ -326,12 +529,9 @@ def handle_update_profile_settings(data: Dict[str, Any]) -> Dict[str, Any]:
     - settings (required): The settings object to update
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
-    if not data.get('settings'):
-        return {'error': 'Missing required parameter: settings', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId', 'settings'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -341,33 +541,42 @@ def handle_update_profile_settings(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile settings table not configured', 'statusCode': 500}
     
     try:
-        # Check if profile exists first
-        if PROFILE_TABLE:
-            profile_table = dynamodb.Table(PROFILE_TABLE)
-            profile_response = profile_table.get_item(
-                Key={
-                    'accountId': accountId,
-                    'profileId': profileId
-                }
-            )
-            if 'Item' not in profile_response:
-                return {'error': 'Profile not found', 'statusCode': 404}
-        
-        # Update profile settings
-        settings_table = dynamodb.Table(PROFILE_SETTINGS_TABLE)
-        
-        # Don't allow direct update of PIN hash for security
+        # Update profile settings - don't allow direct update of PIN hash for security
         if 'pinHash' in settings:
             del settings['pinHash']
         
         # Add timestamp
-        settings['updatedAt'] = datetime.utcnow().isoformat()
+        settings['updatedAt'] = datetime.now(_UTC).isoformat()
         
         # Include key attributes
         settings['accountId'] = accountId
         settings['profileId'] = profileId
         
-        response = settings_table.put_item(Item=settings)
+        if PROFILE_TABLE:
+            # Check the profile exists and write the settings in a single transaction
+            try:
+                _ddb.transact_write_items(TransactItems=[
+                    {
+                        'ConditionCheck': {
+                            'TableName': PROFILE_TABLE,
+                            'Key': _profile_key(accountId, profileId),
+                            'ConditionExpression': 'attribute_exists(profileId)'
+                        }
+                    },
+                    {
+                        'Put': {
+                            'TableName': PROFILE_SETTINGS_TABLE,
+                            'Item': _serialize_item(settings)
+                        }
+                    }
+                ])
+            except ClientError as e:
+                reasons = e.response.get('CancellationReasons') or []
+                if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                    return {'error': 'Profile not found', 'statusCode': 404}
+                raise
+        else:
+            _settings_table.put_item(Item=settings)
         
         return {
             'message': 'Profile settings updated successfully',
@@ -404,12 +613,9 @@ def handle_set_profile_pin(data: Dict[str, Any]) -> Dict[str, Any]:
     - pin (required): The PIN to set (will be hashed before storage)
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
-    if not data.get('pin'):
-        return {'error': 'Missing required parameter: pin', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId', 'pin'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -419,45 +625,28 @@ def handle_set_profile_pin(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile settings table not configured', 'statusCode': 500}
     
     try:
-        # In a real implementation, we would hash the PIN
-        # For demo purposes, we'll store a placeholder hash
-        pin_hash = f"hashed_{pin}_value"
+        pin_hash = _hash_pin(pin)
         
-        settings_table = dynamodb.Table(PROFILE_SETTINGS_TABLE)
-        
-        # Get current settings first
-        response = settings_table.get_item(
+        # Set the PIN in a single update, creating default settings if none exist
+        now_iso = datetime.now(_UTC).isoformat()
+        _settings_table.update_item(
             Key={
                 'accountId': accountId,
                 'profileId': profileId
+            },
+            UpdateExpression=(
+                'SET pinHash = :hash, pinProtected = :protected, updatedAt = :now, '
+                'createdAt = if_not_exists(createdAt, :now), '
+                'contentRestrictions = if_not_exists(contentRestrictions, :restrictions)'
+            ),
+            ExpressionAttributeValues={
+                ':hash': pin_hash,
+                ':protected': True,
+                ':now': now_iso,
+                ':restrictions': dict(DEFAULT_RESTRICTIONS)
             }
         )
         
-        if 'Item' in response:
-            settings = response['Item']
-        else:
-            # Create default settings if none exist
-            settings = {
-                'accountId': accountId,
-                'profileId': profileId,
-                'contentRestrictions': {
-                    'maxRating': 'PG-13',
-                    'blockedGenres': [],
-                    'blockedTitles': [],
-                    'blockedActors': [],
-                    'blockedDirectors': []
-                },
-                'createdAt': datetime.utcnow().isoformat()
-            }
-        
-        # Update PIN settings
-        settings['pinHash'] = pin_hash
-        settings['pinProtected'] = True
-        settings['updatedAt'] = datetime.utcnow().isoformat()
-        
-        # Save settings
-        settings_table.put_item(Item=settings)
-        
         return {
             'message': 'Profile PIN set successfully',
             'profileId': profileId,
@@ -490,12 +679,9 @@ def handle_verify_profile_pin(data: Dict[str, Any]) -> Dict[str, Any]:
     - pin (required): The PIN to verify
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
-    if not data.get('pin'):
-        return {'error': 'Missing required parameter: pin', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId', 'pin'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -505,14 +691,11 @@ def handle_verify_profile_pin(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile settings table not configured', 'statusCode': 500}
     
     try:
-        settings_table = dynamodb.Table(PROFILE_SETTINGS_TABLE)
-        
-        # Get current settings
-        response = settings_table.get_item(
-            Key={
-                'accountId': accountId,
-                'profileId': profileId
-            }
+        # Get current settings - only the raw PIN hash is needed, so skip deserialization
+        response = _ddb.get_item(
+            TableName=PROFILE_SETTINGS_TABLE,
+            Key=_profile_key(accountId, profileId),
+            ProjectionExpression='pinHash'
         )
         
         if 'Item' not in response or 'pinHash' not in response['Item']:
@@ -522,12 +705,11 @@ def handle_verify_profile_pin(data: Dict[str, Any]) -> Dict[str, Any]:
                 'statusCode': 400
             }
         
-        # In a real implementation, we would hash the PIN and compare
-        # For demo purposes, we'll use our placeholder hash format
-        pin_hash = f"hashed_{pin}_value"
-        stored_hash = response['Item']['pinHash']
+        stored_hash = response['Item']['pinHash']['S']
         
-        if pin_hash == stored_hash:
+        if _verify_pin(pin, stored_hash):
+            if _is_legacy_pin_hash(stored_hash):
+                _upgrade_pin_hash(accountId, profileId, pin, stored_hash)
             return {
                 'message': 'PIN verified successfully',
                 'verified': True
@@ -563,10 +745,9 @@ def handle_get_content_restrictions(data: Dict[str, Any]) -> Dict[str, Any]:
     - profileId (required): The ID of the profile to get restrictions for
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -575,13 +756,12 @@ def handle_get_content_restrictions(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile settings table not configured', 'statusCode': 500}
     
     try:
-        settings_table = dynamodb.Table(PROFILE_SETTINGS_TABLE)
-        
-        response = settings_table.get_item(
+        response = _settings_table.get_item(
             Key={
                 'accountId': accountId,
                 'profileId': profileId
-            }
+            },
+            ProjectionExpression='contentRestrictions'
         )
         
         if 'Item' in response and 'contentRestrictions' in response['Item']:
@@ -591,16 +771,8 @@ def handle_get_content_restrictions(data: Dict[str, Any]) -> Dict[str, Any]:
             }
         else:
             # Return default restrictions if none found
-            default_restrictions = {
-                'maxRating': 'PG-13',
-                'blockedGenres': [],
-                'blockedTitles': [],
-                'blockedActors': [],
-                'blockedDirectors': []
-            }
-            
             return {
-                'contentRestrictions': default_restrictions,
+                'contentRestrictions': dict(DEFAULT_RESTRICTIONS),
                 'message': 'Default content restrictions retrieved (no custom restrictions found)'
             }
     except ClientError as e:
@@ -630,12 +802,9 @@ def handle_update_content_restrictions(data: Dict[str, Any]) -> Dict[str, Any]:
     - contentRestrictions (required): The content restrictions object to update
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('profileId'):
-        return {'error': 'Missing required parameter: profileId', 'statusCode': 400}
-    if not data.get('contentRestrictions'):
-        return {'error': 'Missing required parameter: contentRestrictions', 'statusCode': 400}
+    error = _require(data, ('accountId', 'profileId', 'contentRestrictions'))
+    if error:
+        return error
     
     accountId = data['accountId']
     profileId = data['profileId']
@@ -645,33 +814,23 @@ def handle_update_content_restrictions(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Profile settings table not configured', 'statusCode': 500}
     
     try:
-        settings_table = dynamodb.Table(PROFILE_SETTINGS_TABLE)
-        
-        # Get existing settings
-        response = settings_table.get_item(
+        # Update content restrictions in a single update, creating the settings item if needed
+        now_iso = datetime.now(_UTC).isoformat()
+        _settings_table.update_item(
             Key={
                 'accountId': accountId,
                 'profileId': profileId
+            },
+            UpdateExpression=(
+                'SET contentRestrictions = :restrictions, updatedAt = :now, '
+                'createdAt = if_not_exists(createdAt, :now)'
+            ),
+            ExpressionAttributeValues={
+                ':restrictions': content_restrictions,
+                ':now': now_iso
             }
         )
         
-        if 'Item' in response:
-            settings = response['Item']
-        else:
-            # Create new settings if none exist
-            settings = {
-                'accountId': accountId,
-                'profileId': profileId,
-                'createdAt': datetime.utcnow().isoformat()
-            }
-        
-        # Update content restrictions
-        settings['contentRestrictions'] = content_restrictions
-        settings['updatedAt'] = datetime.utcnow().isoformat()
-        
-        # Save settings
-        settings_table.put_item(Item=settings)
-        
         return {
             'message': 'Content restrictions updated successfully',
             'contentRestrictions': content_restrictions
@@ -690,3 +849,15 @@ def handle_update_content_restrictions(data: Dict[str, Any]) -> Dict[str, Any]:
             'details': str(e),
             'statusCode': 500
         }
+
+
+# Operation routing table used by lambda_handler
+_HANDLERS = {
+    'test': handle_test,
+    'getProfileSettings': handle_get_profile_settings,
+    'updateProfileSettings': handle_update_profile_settings,
+    'setProfilePin': handle_set_profile_pin,
+    'verifyProfilePin': handle_verify_profile_pin,
+    'getContentRestrictions': handle_get_content_restrictions,
+    'updateContentRestrictions': handle_update_content_restrictions
+}
@@ -3,16 +3,80 @@ MyAI4 Subscription Lambda Handler
 This Lambda function handles subscription-related operations for the myAI4 platform.
 It provides functionality to manage user subscriptions across all myAI4 services.
 """
+import base64
 import json
 import os
+import time
 import boto3
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from decimal import Decimal
+from types import MappingProxyType
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library when orjson isn't packaged
+    orjson = None
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialize DynamoDB Decimal values, which neither json nor orjson handle natively"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson:
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=_json_default).decode()
+    json_loads = orjson.loads
+else:
+    def json_dumps(obj: Any) -> str:
+        # Response bodies are built from plain dicts and DynamoDB items, which never contain cycles
+        return json.dumps(obj, separators=(',', ':'), check_circular=False, default=_json_default)
+    json_loads = json.loads
+
+_UTC = timezone.utc
+
 
 # Initialize AWS resources
-dynamodb = boto3.resource('dynamodb')
+# The DynamoDB resource and Table objects below are built during Lambda init so the first
+# request doesn't pay for them. The RapidAPI secret is fetched on first use instead, since
+# only the test operation needs it.
+# Keep connections alive and pooled between warm invocations and fail fast on slow calls
+_boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=20,
+    connect_timeout=1,
+    read_timeout=3,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+dynamodb = boto3.resource('dynamodb', config=_boto_config)
+_ddb = dynamodb.meta.client  # Low-level client sharing the resource's connection pool
+_sm_client = None  # Secrets Manager client, created on first use by _get_secrets_client
+
+# RapidAPI secret cache, reused across warm invocations: secret name -> (fetched_at, key)
+_secret_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+SECRETS_TTL = 600  # seconds
+
+# Upper bound on the concurrent handle_test checks as a whole, in seconds
+HEALTH_CHECK_TIMEOUT = 5
+
+# getSubscriptions page size: default when no limit is given, and the largest page served
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Response headers shared by every API Gateway response
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',  # For CORS support
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
 
 # Environment variables - only those needed for subscription operations
 ACCOUNT_TABLE = os.environ.get('ACCOUNT_TABLE')  # For account verification
@@ -23,19 +87,40 @@ USER_USAGE_TABLE = os.environ.get('USER_USAGE_TABLE')  # For optional usage trac
 USER_POOL_ID = os.environ.get('USER_POOL_ID')  # For verifying JWT tokens if handling auth directly
 IDENTITY_POOL_ID = os.environ.get('IDENTITY_POOL_ID')  # For client-side authentication
 
+# DynamoDB Table resources, created once per container and reused across invocations
+_account_table = dynamodb.Table(ACCOUNT_TABLE) if ACCOUNT_TABLE else None
+_subscription_table = dynamodb.Table(SUBSCRIPTION_TABLE) if SUBSCRIPTION_TABLE else None
+
+
+def _require(data: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    """Return a 400 error for the first missing required parameter, or None if all are present"""
+    for key in keys:
+        if not data.get(key):
+            return {'error': f'Missing required parameter: {key}', 'statusCode': 400}
+    return None
+
+
+def _get_secrets_client():
+    """Create the Secrets Manager client on first use and reuse it afterwards"""
+    global _sm_client
+    if _sm_client is None:
+        _sm_client = boto3.client('secretsmanager', config=_boto_config)
+    return _sm_client
+
 
 def get_rapidapi_key():
-    """Get RapidAPI key from AWS Secrets Manager"""
+    """Get RapidAPI key from AWS Secrets Manager, cached across warm invocations"""
     secret_name = os.environ.get('RAPIDAPI_SECRET_NAME')
     if not secret_name:
         raise ValueError("RAPIDAPI_SECRET_NAME environment variable not set")
     
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(service_name='secretsmanager')
+    # Serve the key from the cache while it is still fresh
+    cached = _secret_cache.get(secret_name)
+    if cached and time.monotonic() - cached[0] < SECRETS_TTL:
+        return cached[1]
     
     try:
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+        get_secret_value_response = _get_secrets_client().get_secret_value(SecretId=secret_name)
     except ClientError as error:
         print(f"Error retrieving secret {secret_name}: {str(error)}")
         raise error
@@ -43,14 +128,49 @@ def get_rapidapi_key():
     # Depending on whether the secret is a string or binary, one of these fields will be populated
     if 'SecretString' in get_secret_value_response:
         secret = get_secret_value_response['SecretString']
-        # Parse the JSON string
+        # Parse the JSON string once and cache only the key value
         secret_dict = json.loads(secret)
-        # Return the specific key value
-        return secret_dict.get('rapidapikey')
+        rapidapi_key = secret_dict.get('rapidapikey')
+        _secret_cache[secret_name] = (time.monotonic(), rapidapi_key)
+        return rapidapi_key
     else:
         raise ValueError("Secret value is not in string format")
 
 
+def _check_table(table_name: str, table_var: Optional[str]) -> Tuple[Dict[str, Any], Optional[str], Optional[str]]:
+    """Describe one table for handle_test, returning (status, message, warning)"""
+    if not table_var:
+        return (
+            {'status': 'not_configured', 'error': 'Environment variable not set'},
+            None,
+            f"Table {table_name} not configured (missing env variable)"
+        )
+    
+    try:
+        # DescribeTable is a metadata call that consumes no read capacity
+        item_count = _ddb.describe_table(TableName=table_var)['Table'].get('ItemCount', 'unknown')
+        return (
+            {'status': 'accessible', 'name': table_var, 'item_count': item_count},
+            f"Table {table_var} contains approximately {item_count} items (updated roughly every 6 hours)",
+            None
+        )
+    except ClientError as e:
+        return (
+            {'status': 'error', 'name': table_var, 'error': str(e)},
+            None,
+            f"Error accessing table {table_var}: {str(e)}"
+        )
+
+
+def _check_rapidapi_key() -> Tuple[Optional[str], Optional[str]]:
+    """Check the RapidAPI key for handle_test, returning (message, warning)"""
+    try:
+        _ = get_rapidapi_key()
+        return "RapidAPI key is accessible", None
+    except Exception as e:
+        return None, f"Cannot access RapidAPI key: {str(e)}"
+
+
 def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     """Test handler for API connectivity and diagnostics"""
     # Get the Lambda function name from the context
@@ -71,35 +191,41 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
         if not os.environ.get(env_var):
             warnings.append(f"Environment variable {env_var} not configured")
     
-    # Check all tables
-    for table_name, table_var in {
-        'ACCOUNT_TABLE': ACCOUNT_TABLE,
-        'SUBSCRIPTION_TABLE': SUBSCRIPTION_TABLE,
-        'USER_USAGE_TABLE': USER_USAGE_TABLE,
-    }.items():
-        if table_var:
+    # Check all tables and the RapidAPI key concurrently - the calls are independent
+    # and boto3 clients are thread-safe
+    tables = [
+        ('ACCOUNT_TABLE', ACCOUNT_TABLE),
+        ('SUBSCRIPTION_TABLE', SUBSCRIPTION_TABLE),
+        ('USER_USAGE_TABLE', USER_USAGE_TABLE),
+    ]
+    # Don't wait on the pool when leaving: a hung check must not hold the response past the deadline
+    executor = ThreadPoolExecutor(max_workers=len(tables) + 1)
+    deadline = time.monotonic() + HEALTH_CHECK_TIMEOUT
+    try:
+        table_futures = [
+            (table_name, executor.submit(_check_table, table_name, table_var))
+            for table_name, table_var in tables
+        ]
+        secret_future = executor.submit(_check_rapidapi_key)
+        
+        # Collect in submission order so the report stays stable between calls
+        for table_name, future in table_futures:
             try:
-                table = dynamodb.Table(table_var)
-                item_count = table.scan(Select='COUNT')['Count']
-                table_status[table_name] = {
-                    'status': 'accessible',
-                    'name': table_var,
-                    'item_count': item_count
-                }
-                messages.append(f"Table {table_var} contains {item_count} items")
-            except ClientError as e:
-                table_status[table_name] = {
-                    'status': 'error',
-                    'name': table_var,
-                    'error': str(e)
-                }
-                warnings.append(f"Error accessing table {table_var}: {str(e)}")
-        else:
-            table_status[table_name] = {
-                'status': 'not_configured',
-                'error': 'Environment variable not set'
-            }
-            warnings.append(f"Table {table_name} not configured (missing env variable)")
+                status, message, warning = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                status = {'status': 'error', 'error': 'Check timed out'}
+                message, warning = None, f"Timed out checking table {table_name}"
+            table_status[table_name] = status
+            if message:
+                messages.append(message)
+            if warning:
+                warnings.append(warning)
+        try:
+            secret_message, secret_warning = secret_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            secret_message, secret_warning = None, "Timed out checking RapidAPI key"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     
     # Check infrastructure resources
     parameter_status = {}
@@ -114,20 +240,19 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
             'error': 'Environment variable not set'
         }
     
-    # Check for RapidAPI key
-    try:
-        _ = get_rapidapi_key()
-        messages.append("RapidAPI key is accessible")
-    except Exception as e:
-        warnings.append(f"Cannot access RapidAPI key: {str(e)}")
+    if secret_message:
+        messages.append(secret_message)
+    if secret_warning:
+        warnings.append(secret_warning)
     
     # Get Lambda execution environment
     execution_env = os.environ.get('AWS_EXECUTION_ENV', 'unknown')
     
+    now_iso = datetime.now(_UTC).isoformat()
     return {
         'message': 'MyAI4 Subscription API is operational',
-        'timestamp': datetime.utcnow().isoformat(),
-        'request_time': datetime.utcnow().isoformat(),
+        'timestamp': now_iso,
+        'request_time': now_iso,
         'data_received': data,
         'function': function_name,
         'lambda_name': function_name,
@@ -148,26 +273,25 @@ def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """Create an API Gateway response object"""
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',  # For CORS support
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-        },
-        'body': json.dumps(body)
+        'headers': CORS_HEADERS,
+        'body': json_dumps(body)
     }
 
 
+# Built once; the Lambda runtime only serializes the returned dict, so sharing it is safe
+PREFLIGHT_RESPONSE = create_response(200, {'message': 'CORS preflight successful'})
+
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Subscription Lambda handler for myAI4 platform
     Handles operations related to user subscriptions across myAI4 services
     """
+    # Answer CORS preflight requests before any other work
+    if event.get('httpMethod') == 'OPTIONS':
+        return PREFLIGHT_RESPONSE
+    
     try:
-        # Check for OPTIONS request (CORS preflight)
-        if event.get('httpMethod') == 'OPTIONS':
-            return create_response(200, {'message': 'CORS preflight successful'})
-        
         # Parse the operation from query parameters or request body
         http_method = event.get('httpMethod', 'GET')
         
@@ -180,7 +304,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             # For other HTTP methods, look for operation in body
             body = event.get('body', '{}')
             if isinstance(body, str):
-                body_json = json.loads(body)
+                body_json = json_loads(body)
             else:
                 body_json = body
                 
@@ -191,21 +315,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             return create_response(400, {'error': 'Missing operation parameter'})
             
         # Route to appropriate handler
-        if operation == 'test':
-            result = handle_test(data)
-        elif operation == 'getSubscriptions':
-            result = handle_get_subscriptions(data)
-        elif operation == 'getSubscription':
-            result = handle_get_subscription(data)
-        elif operation == 'createSubscription':
-            result = handle_create_subscription(data)
-        elif operation == 'updateSubscription':
-            result = handle_update_subscription(data)
-        elif operation == 'cancelSubscription':
-            result = handle_cancel_subscription(data)
-        else:
-            result = {'error': f"Unknown operation: {operation}"}
-            return create_response(400, result)
+        handler = _HANDLERS.get(operation)
+        if handler is None:
+            return create_response(400, {'error': f"Unknown operation: {operation}"})
+        result = handler(data)
         
         if result.get('statusCode'):
             # If result already has a statusCode, use it
@@ -227,61 +340,81 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 def handle_get_subscriptions(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Handler for getSubscriptions operation
-    Retrieves all subscriptions for a user account
+    Retrieves subscriptions for a user account, one page at a time
     
     Expected data:
     - accountId (required): The account ID of the user
     - serviceType (optional): Filter by service type
+    - limit (optional): Number of subscriptions to return (default 50, at most 100)
+    - cursor (optional): The cursor returned with the previous page
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
+    error = _require(data, ('accountId',))
+    if error:
+        return error
     
     accountId = data['accountId']
     service_type = data.get('serviceType')
+    try:
+        limit = int(data.get('limit', DEFAULT_PAGE_SIZE))
+        start_key = decode_cursor(str(data['cursor'])) if data.get('cursor') else None
+    except (TypeError, ValueError):
+        return {'error': 'Invalid limit or cursor', 'statusCode': 400}
+    if limit < 1:
+        return {'error': 'Invalid limit or cursor', 'statusCode': 400}
+    limit = min(limit, MAX_PAGE_SIZE)
     
     if not SUBSCRIPTION_TABLE:
         return {'error': 'Subscription table not configured', 'statusCode': 500}
     
     try:
         # Check if account exists
-        if ACCOUNT_TABLE:
-            account_table = dynamodb.Table(ACCOUNT_TABLE)
-            account_response = account_table.get_item(
-                Key={'userId': accountId}  # Using userId as key per your account table structure
+        if _account_table is not None:
+            account_response = _account_table.get_item(
+                Key={'userId': accountId},  # Using userId as key per your account table structure
+                ProjectionExpression='userId'
             )
             if 'Item' not in account_response:
                 return {'error': 'Account not found', 'statusCode': 404}
         
         # Query subscriptions for this account
-        subscription_table = dynamodb.Table(SUBSCRIPTION_TABLE)
-        
         if service_type:
             # Use Global Secondary Index to query by accountId and serviceType
-            response = subscription_table.query(
-                IndexName='ServiceTypeIndex',
-                KeyConditionExpression='accountId = :accountId AND serviceType = :serviceType',
-                ExpressionAttributeValues={
+            query_args = {
+                'IndexName': 'ServiceTypeIndex',
+                'KeyConditionExpression': 'accountId = :accountId AND serviceType = :serviceType',
+                'ExpressionAttributeValues': {
                     ':accountId': accountId,
                     ':serviceType': service_type
                 }
-            )
+            }
         else:
             # Query by accountId only
-            response = subscription_table.query(
-                KeyConditionExpression='accountId = :accountId',
-                ExpressionAttributeValues={
+            query_args = {
+                'KeyConditionExpression': 'accountId = :accountId',
+                'ExpressionAttributeValues': {
                     ':accountId': accountId
                 }
-            )
-        
-        subscriptions = response.get('Items', [])
+            }
+        if start_key:
+            query_args['ExclusiveStartKey'] = start_key
+        
+        # Read pages until the limit is reached or the query is exhausted
+        subscriptions = []
+        while True:
+            response = _subscription_table.query(Limit=limit - len(subscriptions), **query_args)
+            subscriptions.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key or len(subscriptions) >= limit:
+                break
+            query_args['ExclusiveStartKey'] = last_key
         
         return {
             'subscriptions': subscriptions,
             'count': len(subscriptions),
             'accountId': accountId,
-            'serviceType': service_type if service_type else 'all'
+            'serviceType': service_type if service_type else 'all',
+            'cursor': encode_cursor(last_key) if last_key else None
         }
     except ClientError as e:
         print(f"DynamoDB error in getSubscriptions: {str(e)}")
@@ -309,10 +442,9 @@ def handle_get_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
     - subscriptionId (required): The ID of the subscription to retrieve
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('subscriptionId'):
-        return {'error': 'Missing required parameter: subscriptionId', 'statusCode': 400}
+    error = _require(data, ('accountId', 'subscriptionId'))
+    if error:
+        return error
     
     accountId = data['accountId']
     subscriptionId = data['subscriptionId']
@@ -321,9 +453,7 @@ def handle_get_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Subscription table not configured', 'statusCode': 500}
     
     try:
-        subscription_table = dynamodb.Table(SUBSCRIPTION_TABLE)
-        
-        response = subscription_table.get_item(
+        response = _subscription_table.get_item(
             Key={
                 'accountId': accountId,
                 'subscriptionId': subscriptionId
@@ -366,14 +496,9 @@ def handle_create_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
     - paymentMethod (required): The payment method details
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('serviceType'):
-        return {'error': 'Missing required parameter: serviceType', 'statusCode': 400}
-    if not data.get('planId'):
-        return {'error': 'Missing required parameter: planId', 'statusCode': 400}
-    if not data.get('paymentMethod'):
-        return {'error': 'Missing required parameter: paymentMethod', 'statusCode': 400}
+    error = _require(data, ('accountId', 'serviceType', 'planId', 'paymentMethod'))
+    if error:
+        return error
     
     accountId = data['accountId']
     service_type = data['serviceType']
@@ -381,17 +506,18 @@ def handle_create_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
     payment_method = data['paymentMethod']
     
     # Optional fields with defaults
-    start_date = data.get('startDate', datetime.utcnow().isoformat())
+    now_iso = datetime.now(_UTC).isoformat()
+    start_date = data.get('startDate', now_iso)
     
     if not SUBSCRIPTION_TABLE:
         return {'error': 'Subscription table not configured', 'statusCode': 500}
     
     try:
         # Check if account exists
-        if ACCOUNTS_TABLE:
-            account_table = dynamodb.Table(ACCOUNTS_TABLE)
-            account_response = account_table.get_item(
-                Key={'userId': accountId}  # Using userId as key per your account table structure
+        if _account_table is not None:
+            account_response = _account_table.get_item(
+                Key={'userId': accountId},  # Using userId as key per your account table structure
+                ProjectionExpression='userId'
             )
             if 'Item' not in account_response:
                 return {'error': 'Account not found', 'statusCode': 404}
@@ -421,13 +547,12 @@ def handle_create_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
             'lastBillingDate': start_date,
             'nextBillingDate': end_date,
             'paymentMethod': payment_method,
-            'createdAt': datetime.utcnow().isoformat(),
-            'updatedAt': datetime.utcnow().isoformat()
+            'createdAt': now_iso,
+            'updatedAt': now_iso
         }
         
         # Save to DynamoDB
-        subscription_table = dynamodb.Table(SUBSCRIPTION_TABLE)
-        subscription_table.put_item(Item=subscription_item)
+        _subscription_table.put_item(Item=subscription_item)
         
         return {
             'message': 'Subscription created successfully',
@@ -460,12 +585,9 @@ def handle_update_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
     - updates (required): Object containing subscription updates
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('subscriptionId'):
-        return {'error': 'Missing required parameter: subscriptionId', 'statusCode': 400}
-    if not data.get('updates'):
-        return {'error': 'Missing required parameter: updates', 'statusCode': 400}
+    error = _require(data, ('accountId', 'subscriptionId', 'updates'))
+    if error:
+        return error
     
     accountId = data['accountId']
     subscriptionId = data['subscriptionId']
@@ -475,21 +597,6 @@ def handle_update_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Subscription table not configured', 'statusCode': 500}
     
     try:
-        subscription_table = dynamodb.Table(SUBSCRIPTION_TABLE)
-        
-        # Get current subscription
-        response = subscription_table.get_item(
-            Key={
-                'accountId': accountId,
-                'subscriptionId': subscriptionId
-            }
-        )
-        
-        if 'Item' not in response:
-            return {'error': 'Subscription not found', 'statusCode': 404}
-        
-        current_subscription = response['Item']
-        
         # Don't allow direct updates to critical fields for security
         protected_fields = ['accountId', 'subscriptionId', 'createdAt']
         for field in protected_fields:
@@ -499,7 +606,18 @@ def handle_update_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
         # Handle plan change if needed
         if 'planId' in updates:
             new_plan_id = updates['planId']
-            service_type = current_subscription['serviceType']
+            
+            # The plan lookup needs the current service type, so only this path reads the item first
+            response = _subscription_table.get_item(
+                Key={
+                    'accountId': accountId,
+                    'subscriptionId': subscriptionId
+                },
+                ProjectionExpression='serviceType'
+            )
+            if 'Item' not in response:
+                return {'error': 'Subscription not found', 'statusCode': 404}
+            service_type = response['Item']['serviceType']
             
             # Get details for the new plan
             new_plan_details = get_plan_details(new_plan_id, service_type)
@@ -510,33 +628,30 @@ def handle_update_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
             # In a real system, we might handle prorated billing here
         
         # Add timestamp
-        updates['updatedAt'] = datetime.utcnow().isoformat()
-        
-        # Build update expression for DynamoDB
-        update_expression = "set "
-        expression_attribute_values = {}
-        
-        for key, value in updates.items():
-            update_expression += f"#{key} = :{key}, "
-            expression_attribute_values[f":{key}"] = value
-        
-        # Remove trailing comma and space
-        update_expression = update_expression[:-2]
-        
-        # Build expression attribute names (to handle reserved words)
-        expression_attribute_names = {f"#{key}": key for key in updates.keys()}
-        
-        # Update the item in DynamoDB
-        response = subscription_table.update_item(
-            Key={
-                'accountId': accountId,
-                'subscriptionId': subscriptionId
-            },
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-            ExpressionAttributeNames=expression_attribute_names,
-            ReturnValues="ALL_NEW"
-        )
+        updates['updatedAt'] = datetime.now(_UTC).isoformat()
+        
+        # Build update expression for DynamoDB, with attribute names to handle reserved words
+        update_expression = "set " + ", ".join(f"#{key} = :{key}" for key in updates)
+        expression_attribute_values = {f":{key}": value for key, value in updates.items()}
+        expression_attribute_names = {f"#{key}": key for key in updates}
+        
+        # Update the item in DynamoDB, only if the subscription exists
+        try:
+            response = _subscription_table.update_item(
+                Key={
+                    'accountId': accountId,
+                    'subscriptionId': subscriptionId
+                },
+                UpdateExpression=update_expression,
+                ConditionExpression='attribute_exists(subscriptionId)',
+                ExpressionAttributeValues=expression_attribute_values,
+                ExpressionAttributeNames=expression_attribute_names,
+                ReturnValues="ALL_NEW"
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return {'error': 'Subscription not found', 'statusCode': 404}
+            raise
         
         updated_subscription = response.get('Attributes', {})
         
@@ -572,10 +687,9 @@ def handle_cancel_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
     - immediateEffect (optional): Whether to cancel immediately or at the end of the billing cycle
     """
     # Validate required parameters
-    if not data.get('accountId'):
-        return {'error': 'Missing required parameter: accountId', 'statusCode': 400}
-    if not data.get('subscriptionId'):
-        return {'error': 'Missing required parameter: subscriptionId', 'statusCode': 400}
+    error = _require(data, ('accountId', 'subscriptionId'))
+    if error:
+        return error
     
     accountId = data['accountId']
     subscriptionId = data['subscriptionId']
@@ -586,49 +700,42 @@ def handle_cancel_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Subscription table not configured', 'statusCode': 500}
     
     try:
-        subscription_table = dynamodb.Table(SUBSCRIPTION_TABLE)
-        
-        # Get current subscription
-        response = subscription_table.get_item(
-            Key={
-                'accountId': accountId,
-                'subscriptionId': subscriptionId
-            }
-        )
-        
-        if 'Item' not in response:
-            return {'error': 'Subscription not found', 'statusCode': 404}
-        
-        current_subscription = response['Item']
-        
-        # Check if already cancelled
-        if current_subscription['status'] == 'cancelled':
-            return {'error': 'Subscription is already cancelled', 'statusCode': 400}
-        
         # Determine new status based on immediate_effect
         new_status = 'cancelled' if immediate_effect else 'pending_cancellation'
         
-        # Update the subscription
-        response = subscription_table.update_item(
-            Key={
-                'accountId': accountId,
-                'subscriptionId': subscriptionId
-            },
-            UpdateExpression="set #status = :status, #cancellationReason = :reason, #cancellationDate = :date, #updatedAt = :updatedAt",
-            ExpressionAttributeNames={
-                "#status": "status",
-                "#cancellationReason": "cancellationReason",
-                "#cancellationDate": "cancellationDate",
-                "#updatedAt": "updatedAt"
-            },
-            ExpressionAttributeValues={
-                ":status": new_status,
-                ":reason": cancellation_reason,
-                ":date": datetime.utcnow().isoformat(),
-                ":updatedAt": datetime.utcnow().isoformat()
-            },
-            ReturnValues="ALL_NEW"
-        )
+        # Update the subscription in one call; the condition rejects missing or already cancelled
+        # subscriptions, and ALL_OLD on failure tells the two cases apart without another read
+        now_iso = datetime.now(_UTC).isoformat()
+        try:
+            response = _subscription_table.update_item(
+                Key={
+                    'accountId': accountId,
+                    'subscriptionId': subscriptionId
+                },
+                UpdateExpression="set #status = :status, #cancellationReason = :reason, #cancellationDate = :date, #updatedAt = :updatedAt",
+                ConditionExpression="attribute_exists(subscriptionId) AND #status <> :cancelled",
+                ExpressionAttributeNames={
+                    "#status": "status",
+                    "#cancellationReason": "cancellationReason",
+                    "#cancellationDate": "cancellationDate",
+                    "#updatedAt": "updatedAt"
+                },
+                ExpressionAttributeValues={
+                    ":status": new_status,
+                    ":reason": cancellation_reason,
+                    ":date": now_iso,
+                    ":updatedAt": now_iso,
+                    ":cancelled": 'cancelled'
+                },
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD"
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            if 'Item' not in e.response:
+                return {'error': 'Subscription not found', 'statusCode': 404}
+            return {'error': 'Subscription is already cancelled', 'statusCode': 400}
         
         updated_subscription = response.get('Attributes', {})
         
@@ -655,72 +762,83 @@ def handle_cancel_subscription(data: Dict[str, Any]) -> Dict[str, Any]:
 
 # Helper functions
 
-def get_plan_details(plan_id: str, service_type: str) -> Dict[str, Any]:
-    """Get details for a subscription plan (mock implementation)"""
-    # In a real implementation, this would fetch from a plans table or service
-    plans = {
-        'streaming': {
-            'basic': {
-                'name': 'Basic Streaming',
-                'price': 8.99,
-                'currency': 'USD',
-                'billingCycle': 'monthly',
-                'features': ['HD streaming', 'Single device', 'Limited catalog'],
-                'maxProfiles': 1
-            },
-            'standard': {
-                'name': 'Standard Streaming',
-                'price': 13.99,
-                'currency': 'USD',
-                'billingCycle': 'monthly',
-                'features': ['HD streaming', 'Two devices', 'Full catalog'],
-                'maxProfiles': 3
-            },
-            'premium': {
-                'name': 'Premium Streaming',
-                'price': 17.99,
-                'currency': 'USD',
-                'billingCycle': 'monthly',
-                'features': ['4K Ultra HD', 'Four devices', 'Full catalog', 'Offline downloads'],
-                'maxProfiles': 5
-            },
-            'annual': {
-                'name': 'Annual Streaming',
-                'price': 149.99,
-                'currency': 'USD',
-                'billingCycle': 'annual',
-                'features': ['4K Ultra HD', 'Four devices', 'Full catalog', 'Offline downloads', '15% discount'],
-                'maxProfiles': 5
-            }
+def encode_cursor(last_key: Dict[str, Any]) -> str:
+    """Encode a DynamoDB LastEvaluatedKey as an opaque, URL-safe pagination cursor"""
+    return base64.urlsafe_b64encode(json_dumps(last_key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor from encode_cursor back into an ExclusiveStartKey"""
+    start_key = json_loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(start_key, dict):
+        raise ValueError("Cursor does not encode a key")
+    return start_key
+
+
+# Subscription plan catalogue (normally this would come from a plans table).
+# Read-only; get_plan_details returns copies. Prices are Decimals because DynamoDB rejects floats.
+PLANS = MappingProxyType({
+    'streaming': MappingProxyType({
+        'basic': {
+            'name': 'Basic Streaming',
+            'price': Decimal('8.99'),
+            'currency': 'USD',
+            'billingCycle': 'monthly',
+            'features': ['HD streaming', 'Single device', 'Limited catalog'],
+            'maxProfiles': 1
         },
-        'shopping': {
-            'prime': {
-                'name': 'Shopping Prime',
-                'price': 9.99,
-                'currency': 'USD',
-                'billingCycle': 'monthly',
-                'features': ['Free shipping', 'Special deals', 'Early access']
-            }
-        }
-    }
-    
-    try:
-        return plans.get(service_type, {}).get(plan_id, {
-            'name': f'Unknown Plan ({plan_id})',
-            'price': 0.00,
+        'standard': {
+            'name': 'Standard Streaming',
+            'price': Decimal('13.99'),
             'currency': 'USD',
             'billingCycle': 'monthly',
-            'features': []
-        })
-    except Exception as e:
-        print(f"Error getting plan details: {str(e)}")
-        return {
-            'name': f'Error Plan ({plan_id})',
-            'price': 0.00,
+            'features': ['HD streaming', 'Two devices', 'Full catalog'],
+            'maxProfiles': 3
+        },
+        'premium': {
+            'name': 'Premium Streaming',
+            'price': Decimal('17.99'),
+            'currency': 'USD',
+            'billingCycle': 'monthly',
+            'features': ['4K Ultra HD', 'Four devices', 'Full catalog', 'Offline downloads'],
+            'maxProfiles': 5
+        },
+        'annual': {
+            'name': 'Annual Streaming',
+            'price': Decimal('149.99'),
+            'currency': 'USD',
+            'billingCycle': 'annual',
+            'features': ['4K Ultra HD', 'Four devices', 'Full catalog', 'Offline downloads', '15% discount'],
+            'maxProfiles': 5
+        }
+    }),
+    'shopping': MappingProxyType({
+        'prime': {
+            'name': 'Shopping Prime',
+            'price': Decimal('9.99'),
             'currency': 'USD',
             'billingCycle': 'monthly',
-            'features': []
+            'features': ['Free shipping', 'Special deals', 'Early access']
         }
+    })
+})
+
+# Details returned for plan IDs missing from PLANS; the name is filled in per plan ID
+FALLBACK_PLAN = MappingProxyType({
+    'price': Decimal('0.00'),
+    'currency': 'USD',
+    'billingCycle': 'monthly',
+    'features': []
+})
+
+
+def get_plan_details(plan_id: str, service_type: str) -> Dict[str, Any]:
+    """Get details for a subscription plan (mock implementation)"""
+    # In a real implementation, this would fetch from a plans table or service
+    plan = PLANS.get(service_type, {}).get(plan_id)
+    if plan is None:
+        return {'name': f'Unknown Plan ({plan_id})', **FALLBACK_PLAN, 'features': []}
+    return {**plan, 'features': list(plan['features'])}
 
 
 def calculate_end_date(start_date_str: str, billing_cycle: str) -> str:
@@ -729,7 +847,7 @@ def calculate_end_date(start_date_str: str, billing_cycle: str) -> str:
         start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
     except ValueError:
         # Handle potential format issues
-        start_date = datetime.utcnow()
+        start_date = datetime.now(_UTC)
     
     if billing_cycle == 'monthly':
         end_date = start_date + timedelta(days=30)
@@ -742,3 +860,14 @@ def calculate_end_date(start_date_str: str, billing_cycle: str) -> str:
         end_date = start_date + timedelta(days=30)
     
     return end_date.isoformat()
+
+
+# Operation routing table used by lambda_handler
+_HANDLERS = {
+    'test': handle_test,
+    'getSubscriptions': handle_get_subscriptions,
+    'getSubscription': handle_get_subscription,
+    'createSubscription': handle_create_subscription,
+    'updateSubscription': handle_update_subscription,
+    'cancelSubscription': handle_cancel_subscription
+}
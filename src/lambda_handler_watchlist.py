@@ -6,13 +6,65 @@ It provides functionality to add, remove, and retrieve watchlist items.
 
 import os
 import json
+import time
 import boto3
-from datetime import datetime
-from typing import Dict, Any, Optional
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library when orjson isn't packaged
+    orjson = None
+
+def _json_default(obj: Any) -> Any:
+    """Serialize DynamoDB Decimal values, which neither json nor orjson handle natively"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson:
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=_json_default).decode()
+    json_loads = orjson.loads
+else:
+    def json_dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(',', ':'), default=_json_default)
+    json_loads = json.loads
 
 # Initialize AWS resources
-dynamodb = boto3.resource('dynamodb')
+# Keep connections alive and pooled between warm invocations and fail fast on slow calls
+_boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    connect_timeout=1,
+    read_timeout=3,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+dynamodb = boto3.resource('dynamodb', config=_boto_config)
+_sm_client = None  # Secrets Manager client, created on first use by _get_secrets_client
+
+# RapidAPI secret cache, reused across warm invocations: secret name -> (fetched_at, key)
+_secret_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+SECRETS_TTL = int(os.environ.get('RAPIDAPI_SECRET_TTL', '300'))  # seconds
+
+# Response headers shared by every API Gateway response
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',  # For CORS support
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
+
+# Optionally strip empty and placeholder values from response bodies to cut payload size.
+# Keys clients read even when empty or zero are always kept.
+COMPACT_RESPONSES = os.environ.get('COMPACT_RESPONSES', '0').lower() in ('1', 'true')
+COMPACT_KEEP_KEYS = frozenset({'statusCode', 'count', 'deletedCount', 'watchlist', 'history'})
 
 # Environment variables - only those needed for watchlist operations
 ACCOUNT_TABLE = os.environ.get('ACCOUNT_TABLE')  # For account verification
@@ -30,19 +82,134 @@ USER_POOL_ID = os.environ.get('USER_POOL_ID')  # For verifying JWT tokens if han
 # - MOVIES_TABLE - Movie data should be fetched from movies Lambda
 # - IDENTITY_POOL_ID - Not needed for server-side operations
 
+# Watchlist item attributes returned by getWatchlist (accountId is already known to the caller).
+# Every name goes through a placeholder so none can collide with a DynamoDB reserved word.
+WATCHLIST_ATTRIBUTES = ('movieId', 'profileId', 'addedAt', 'updatedAt', 'notes', 'priority', 'tags')
+WATCHLIST_PROJECTION = ', '.join(f'#{name}' for name in WATCHLIST_ATTRIBUTES)
+WATCHLIST_PROJECTION_NAMES = {f'#{name}': name for name in WATCHLIST_ATTRIBUTES}
+
+# Environment variables handle_test expects to be set
+_REQUIRED_ENVS = (
+    'PROFILE_TABLE', 'SUBSCRIPTIONS_TABLE', 'SERVICE_PREFERENCES_TABLE',
+    'USER_USAGE_TABLE', 'MOVIES_TABLE', 'WATCHLISTS_TABLE', 'WATCH_HISTORY_TABLE',
+    'RAPIDAPI_SECRET_NAME', 'ENVIRONMENT', 'IDENTITY_POOL_PARAM_NAME'
+)
+
+# (report name, environment variable) for each table handle_test describes
+_TABLE_VARS = (
+    ('PROFILE_TABLE', 'PROFILE_TABLE'),
+    ('SUBSCRIPTIONS_TABLE', 'SUBSCRIPTIONS_TABLE'),
+    ('SERVICE_PREFERENCES_TABLE', 'SERVICE_PREFERENCES_TABLE'),
+    ('USER_USAGE_TABLE', 'USER_USAGE_TABLE'),
+    ('MOVIES_TABLE', 'MOVIES_TABLE'),
+    ('WATCHLISTS_TABLE', 'WATCHLISTS_TABLE'),
+    ('WATCH_HISTORY_TABLE', 'WATCH_HISTORY_TABLE'),
+)
+
+# Upper bound on the concurrent handle_test checks as a whole, in seconds
+HEALTH_CHECK_TIMEOUT = 5
+
+# BatchWriteItem accepts at most 25 requests; large watchlist deletes send batches in parallel
+BATCH_WRITE_LIMIT = 25
+DELETE_WORKERS = 8
+
+# DynamoDB Table resources, created once per container and reused across invocations
+_watchlists_table = dynamodb.Table(WATCHLISTS_TABLE) if WATCHLISTS_TABLE else None
+
+# Surface missing core configuration once at cold start rather than only when a request
+# hits it. Handlers still return a 500 for the unconfigured table, so 'test' keeps working.
+for _env_var, _value in (('WATCHLISTS_TABLE', WATCHLISTS_TABLE), ('WATCH_HISTORY_TABLE', WATCH_HISTORY_TABLE)):
+    if not _value:
+        print(f"WARNING: {_env_var} environment variable is not set")
+
+# Low-level client for the read-heavy queries, which deserialize items themselves.
+# A plain client is required here: the resource's meta.client would serialize the
+# already-typed ExpressionAttributeValues a second time.
+_ddb = boto3.client('dynamodb', config=_boto_config)
+_deserializer = TypeDeserializer()
+
+# Per-call DynamoDB timing, logged as CloudWatch Embedded Metric Format when enabled
+DDB_TIMING_METRICS = os.environ.get('DDB_TIMING_METRICS', 'false').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'WatchlistApi')
+
+def _start_ddb_timer(context: Dict[str, Any], **kwargs: Any) -> None:
+    """before-call hook: remember when the API call started"""
+    context['ddb_started_at'] = time.perf_counter()
+
+def _log_ddb_timing(model: Any, parsed: Dict[str, Any], context: Dict[str, Any], **kwargs: Any) -> None:
+    """after-call hook: emit the call's wall time (including retries) as an EMF record"""
+    started_at = context.get('ddb_started_at')
+    if started_at is None:
+        return
+    metadata = parsed.get('ResponseMetadata', {})
+    print(json_dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Operation']],
+                'Metrics': [{'Name': 'DynamoDBCallDuration', 'Unit': 'Milliseconds'}]
+            }]
+        },
+        'Operation': model.name,
+        'DynamoDBCallDuration': (time.perf_counter() - started_at) * 1000,
+        'HTTPStatusCode': metadata.get('HTTPStatusCode'),
+        'RetryAttempts': metadata.get('RetryAttempts', 0)
+    }))
+
+if DDB_TIMING_METRICS:
+    # Reads go through _ddb, writes through the Table resource's client - time both
+    for _client in (_ddb, dynamodb.meta.client):
+        _client.meta.events.register('before-call.dynamodb', _start_ddb_timer)
+        _client.meta.events.register('after-call.dynamodb', _log_ddb_timing)
+
+def _get_secrets_client():
+    """Create the Secrets Manager client on first use and reuse it afterwards"""
+    global _sm_client
+    if _sm_client is None:
+        _sm_client = boto3.client('secretsmanager', config=_boto_config)
+    return _sm_client
+
+def query_all_items(table: Any, limit: Optional[int] = None, **query_kwargs: Any) -> List[Dict[str, Any]]:
+    """
+    Run a Table or client query and follow LastEvaluatedKey until the results are exhausted
+    If limit is given, stop once that many items have been collected.
+    """
+    items: List[Dict[str, Any]] = []
+    if limit is not None and limit <= 0:
+        # DynamoDB rejects Limit=0, and there is nothing to fetch anyway
+        return items
+    while True:
+        if limit is not None:
+            query_kwargs['Limit'] = limit - len(items)
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key or (limit is not None and len(items) >= limit):
+            return items if limit is None else items[:limit]
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def _deserialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a low-level DynamoDB item to Python values, taking plain strings directly"""
+    return {
+        key: value['S'] if 'S' in value else _deserializer.deserialize(value)
+        for key, value in item.items()
+    }
+
 # Mock RapidAPI key function - remove when integrating
 def get_rapidapi_key():
-    """Get RapidAPI key from AWS Secrets Manager"""
+    """Get RapidAPI key from AWS Secrets Manager, cached across warm invocations"""
     secret_name = os.environ.get('RAPIDAPI_SECRET_NAME')
     if not secret_name:
         raise ValueError("RAPIDAPI_SECRET_NAME environment variable not set")
     
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(service_name='secretsmanager')
+    # Serve the key from the cache while it is still fresh
+    cached = _secret_cache.get(secret_name)
+    if cached and time.monotonic() - cached[0] < SECRETS_TTL:
+        return cached[1]
     
     try:
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+        get_secret_value_response = _get_secrets_client().get_secret_value(SecretId=secret_name)
     except ClientError as error:
         print(f"Error retrieving secret {secret_name}: {str(error)}")
         raise error
@@ -50,13 +217,50 @@ def get_rapidapi_key():
     # Depending on whether the secret is a string or binary, one of these fields will be populated
     if 'SecretString' in get_secret_value_response:
         secret = get_secret_value_response['SecretString']
-        # Parse the JSON string
+        # Parse the JSON string once and cache only the key value
         secret_dict = json.loads(secret)
-        # Return the specific key value
-        return secret_dict.get('rapidapikey')
+        rapidapi_key = secret_dict.get('rapidapikey')
+        _secret_cache[secret_name] = (time.monotonic(), rapidapi_key)
+        return rapidapi_key
     else:
         raise ValueError("Secret value is not in string format")
 
+def _check_table(table_var: Optional[str]) -> Dict[str, Any]:
+    """Describe one table for handle_test and return its status entry"""
+    if not table_var:
+        return {
+            'status': 'missing',
+            'name': 'Table name not configured'
+        }
+    
+    try:
+        # Get more detailed table information
+        table_details = dynamodb.meta.client.describe_table(TableName=table_var)
+        
+        return {
+            'status': 'accessible',
+            'name': table_var,
+            'details': {
+                'item_count': table_details['Table'].get('ItemCount', 'unknown'),
+                'table_status': table_details['Table'].get('TableStatus', 'unknown'),
+                'size_bytes': table_details['Table'].get('TableSizeBytes', 'unknown')
+            }
+        }
+    except Exception as e:
+        return {
+            'status': 'error',
+            'name': table_var,
+            'error': str(e)
+        }
+
+def _check_rapidapi_key() -> Tuple[Optional[str], Optional[str]]:
+    """Check the RapidAPI key for handle_test, returning (message, warning)"""
+    try:
+        _ = get_rapidapi_key()
+        return "RapidAPI key is accessible", None
+    except Exception as e:
+        return None, f"Cannot access RapidAPI key: {str(e)}"
+
 def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     """Test handler for API connectivity and diagnostics"""
     # Get the Lambda function name from the context
@@ -68,57 +272,42 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
     warnings = []
     messages = []
     # Check for required environment variables
-    for env_var in [
-        'PROFILE_TABLE', 'SUBSCRIPTIONS_TABLE', 'SERVICE_PREFERENCES_TABLE',
-        'USER_USAGE_TABLE', 'MOVIES_TABLE', 'WATCHLISTS_TABLE', 'WATCH_HISTORY_TABLE', 
-        'RAPIDAPI_SECRET_NAME', 'ENVIRONMENT', 'IDENTITY_POOL_PARAM_NAME'
-    ]:
+    for env_var in _REQUIRED_ENVS:
         if not os.environ.get(env_var):
             warnings.append(f"Environment variable {env_var} is not set")
     
-    # Check all tables
-    for table_name, table_var in {
-        'PROFILE_TABLE': PROFILE_TABLE,
-        'SUBSCRIPTIONS_TABLE': SUBSCRIPTIONS_TABLE,
-        'SERVICE_PREFERENCES_TABLE': SERVICE_PREFERENCES_TABLE,
-        'USER_USAGE_TABLE': USER_USAGE_TABLE,
-        'MOVIES_TABLE': MOVIES_TABLE,
-        'WATCHLISTS_TABLE': WATCHLISTS_TABLE,
-        'WATCH_HISTORY_TABLE': WATCH_HISTORY_TABLE,
-    }.items():
-        if table_var:
+    # Check all tables and the RapidAPI key concurrently - the calls are independent
+    # and boto3 clients are thread-safe
+    # Don't wait on the pool when leaving: a hung check must not hold the response past the deadline
+    executor = ThreadPoolExecutor(max_workers=len(_TABLE_VARS) + 1)
+    deadline = time.monotonic() + HEALTH_CHECK_TIMEOUT
+    try:
+        table_futures = [
+            (table_name, executor.submit(_check_table, os.environ.get(env_var)))
+            for table_name, env_var in _TABLE_VARS
+        ]
+        secret_future = executor.submit(_check_rapidapi_key)
+        
+        # Collect in submission order so the report stays stable between calls
+        for table_name, future in table_futures:
             try:
-                table = dynamodb.Table(table_var)
-                # Get more detailed table information
-                table_details = table.meta.client.describe_table(TableName=table_var)
-                
-                table_status[table_name] = {
-                    'status': 'accessible',
-                    'name': table_var,
-                    'details': {
-                        'item_count': table_details['Table'].get('ItemCount', 'unknown'),
-                        'table_status': table_details['Table'].get('TableStatus', 'unknown'),
-                        'size_bytes': table_details['Table'].get('TableSizeBytes', 'unknown')
-                    }
-                }
-            except Exception as e:
-                table_status[table_name] = {
-                    'status': 'error',
-                    'name': table_var,
-                    'error': str(e)
-                }
-        else:
-            table_status[table_name] = {
-                'status': 'missing',
-                'name': 'Table name not configured'
-            }    
+                table_status[table_name] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                table_status[table_name] = {'status': 'error', 'error': 'Check timed out'}
+        try:
+            secret_message, secret_warning = secret_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            secret_message, secret_warning = None, "Timed out checking RapidAPI key"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     
     # Check environment variables for infrastructure resources
     parameter_status = {}
-    if IDENTITY_POOL_ID:
+    identity_pool_id = os.environ.get('IDENTITY_POOL_ID')
+    if identity_pool_id:
         parameter_status['IDENTITY_POOL_ID'] = {
             'status': 'accessible',
-            'value': IDENTITY_POOL_ID
+            'value': identity_pool_id
         }
     else:
         parameter_status['IDENTITY_POOL_ID'] = {
@@ -126,20 +315,19 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
             'error': 'Environment variable not set'
         }
     
-    # Check for RapidAPI key
-    try:
-        _ = get_rapidapi_key()
-        messages.append("RapidAPI key is accessible")
-    except Exception as e:
-        warnings.append(f"Cannot access RapidAPI key: {str(e)}")
+    if secret_message:
+        messages.append(secret_message)
+    if secret_warning:
+        warnings.append(secret_warning)
     
     # Get Lambda execution environment
     execution_env = os.environ.get('AWS_EXECUTION_ENV', 'unknown')
     
+    now_iso = datetime.now(timezone.utc).isoformat()
     return {
         'message': 'MyAI4 Centralized API is operational',
-        'timestamp': datetime.utcnow().isoformat(),
-        'request_time': datetime.utcnow().isoformat(),
+        'timestamp': now_iso,
+        'request_time': now_iso,
         'data_received': data,
         'parameter_status': parameter_status,
         'function': function_name,
@@ -156,19 +344,41 @@ def handle_test(data: Dict[str, Any]) -> Dict[str, Any]:
         'messages': messages
     }
 
+def _compact(value: Any) -> Any:
+    """Recursively drop empty, null and 'unknown' entries from response dicts"""
+    if isinstance(value, dict):
+        compacted = {}
+        for key, item in value.items():
+            item = _compact(item)
+            # Numeric zeros and False carry meaning, so only empty/null values are dropped
+            if key in COMPACT_KEEP_KEYS or (item or item == 0) and item != 'unknown':
+                compacted[key] = item
+        return compacted
+    if isinstance(value, list):
+        return [_compact(item) for item in value]
+    return value
+
 def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """Create an API Gateway response object"""
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',  # For CORS support
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-        },
-        'body': json.dumps(body)
+        'headers': CORS_HEADERS,
+        'body': json_dumps(_compact(body) if COMPACT_RESPONSES else body)
     }
 
+def _parse_request(event: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Pull the operation name and its data out of an API Gateway event"""
+    if event.get('httpMethod', 'GET') == 'GET':
+        # For GET requests, operation is in query parameters
+        query_params = event.get('queryStringParameters') or {}
+        raw_data = query_params.get('data')
+        return query_params.get('operation'), json_loads(raw_data) if raw_data else {}
+    
+    # For POST/PATCH requests, operation is in request body (str or bytes)
+    raw_body = event.get('body')
+    body = json_loads(raw_body) if raw_body else {}
+    return body.get('operation'), body.get('data') or {}
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Watchlist Lambda handler for myAI4 platform
@@ -179,40 +389,12 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if event.get('httpMethod') == 'OPTIONS':
             return create_response(200, {'message': 'CORS preflight successful'})
             
-        # Parse the operation from query parameters or request body
-        http_method = event.get('httpMethod', 'GET')
-        
-        if http_method == 'GET':
-            # For GET requests, operation is in query parameters
-            query_params = event.get('queryStringParameters') or {}
-            operation = query_params.get('operation')
-            data = json.loads(query_params.get('data', '{}'))
-        else:
-            # For POST/PATCH requests, operation is in request body
-            body = json.loads(event.get('body', '{}'))
-            operation = body.get('operation')
-            data = body.get('data', {})
-            
+        operation, data = _parse_request(event)
         if not operation:
             return create_response(400, {'error': 'Operation parameter is required'})
             
-        # Route to appropriate handler - only watchlist related operations
-        handlers = {
-            # Test operation
-            'test': handle_test,
-            
-            # Watchlist Operations
-            'getWatchlist': handle_get_watchlist,
-            'deleteWatchlist': handle_delete_watchlist,
-            'updateWatchlist': handle_update_watchlist,
-            
-            # Watch History Operations
-            'getWatchHistory': handle_get_watch_history,
-            'deleteWatchHistory': handle_delete_watch_history,
-            'updateWatchRecord': handle_update_watch_record
-        }
-        
-        handler = handlers.get(operation)
+        # Route to appropriate handler
+        handler = _HANDLERS.get(operation)
         if not handler:
             return create_response(400, {'error': f'Unknown operation: {operation}'})
             
@@ -242,28 +424,23 @@ def handle_get_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Watchlists table not configured', 'statusCode': 500}
     
     try:
-        table = dynamodb.Table(WATCHLISTS_TABLE)
-        
-        # Query for all watchlist items for this user
-        response = table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('accountId').eq(accountId)
-        )
-        
-        watchlist_items = response.get('Items', [])
-        
-        # Handle pagination if there are more results
-        while 'LastEvaluatedKey' in response:
-            response = table.query(
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('accountId').eq(accountId),
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            watchlist_items.extend(response.get('Items', []))
+        # Query for all watchlist items for this user, returning only the fields clients use
+        query_kwargs = {
+            'TableName': WATCHLISTS_TABLE,
+            'KeyConditionExpression': '#accountId = :accountId',
+            'ProjectionExpression': WATCHLIST_PROJECTION,
+            'ExpressionAttributeNames': {**WATCHLIST_PROJECTION_NAMES, '#accountId': 'accountId'},
+            'ExpressionAttributeValues': {':accountId': {'S': accountId}}
+        }
+        watchlist_items = [
+            _deserialize_item(item) for item in query_all_items(_ddb, **query_kwargs)
+        ]
         
         return {
             'statusCode': 200,
             'watchlist': watchlist_items,
             'count': len(watchlist_items),
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat()
         }
         
     except ClientError as e:
@@ -305,14 +482,13 @@ def handle_add_to_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Watchlists table not configured', 'statusCode': 500}
     
     try:
-        table = dynamodb.Table(WATCHLISTS_TABLE)
-        
         # Create or update watchlist entry
+        now_iso = datetime.now(timezone.utc).isoformat()
         watchlist_item = {
             'accountId': accountId,
             'movieId': movieId,
-            'addedAt': datetime.utcnow().isoformat(),
-            'updatedAt': datetime.utcnow().isoformat()
+            'addedAt': now_iso,
+            'updatedAt': now_iso
         }
         
         # Add profileId if provided
@@ -320,13 +496,13 @@ def handle_add_to_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
             watchlist_item['profileId'] = profileId
         
         # Add to watchlist
-        table.put_item(Item=watchlist_item)
+        _watchlists_table.put_item(Item=watchlist_item)
         
         return {
             'statusCode': 200,
             'message': 'Movie added to watchlist successfully',
             'watchlistItem': watchlist_item,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': now_iso
         }
         
     except ClientError as e:
@@ -366,10 +542,8 @@ def handle_remove_from_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Watchlists table not configured', 'statusCode': 500}
     
     try:
-        table = dynamodb.Table(WATCHLISTS_TABLE)
-        
         # Delete watchlist entry
-        table.delete_item(
+        _watchlists_table.delete_item(
             Key={
                 'accountId': accountId,
                 'movieId': movieId
@@ -379,7 +553,7 @@ def handle_remove_from_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
         return {
             'statusCode': 200,
             'message': 'Movie removed from watchlist successfully',
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat()
         }
         
     except ClientError as e:
@@ -397,6 +571,17 @@ def handle_remove_from_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
             'statusCode': 500
         }
 
+def _delete_watchlist_items(items: List[Dict[str, Any]]) -> None:
+    """Delete one chunk of watchlist items with its own batch writer, so chunks can run in parallel"""
+    with _watchlists_table.batch_writer() as batch:
+        for item in items:
+            batch.delete_item(
+                Key={
+                    'accountId': item['accountId'],
+                    'movieId': item['movieId']
+                }
+            )
+
 def handle_delete_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Handler for deleteWatchlist operation
@@ -416,44 +601,38 @@ def handle_delete_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Watchlists table not configured', 'statusCode': 500}
 
     try:
-        table = dynamodb.Table(WATCHLISTS_TABLE)
-
-        # Query for all watchlist items for this user (and profile if provided)
-        key_condition = boto3.dynamodb.conditions.Key('accountId').eq(accountId)
-        filter_expression = None
+        # Query the keys of all watchlist items for this user, or for one profile through
+        # ProfileIndex so DynamoDB only reads that profile's items instead of filtering them
         if profileId:
-            filter_expression = boto3.dynamodb.conditions.Attr('profileId').eq(profileId)
-
-        query_kwargs = {'KeyConditionExpression': key_condition}
-        if filter_expression:
-            query_kwargs['FilterExpression'] = filter_expression
+            query_kwargs = {
+                'IndexName': 'ProfileIndex',
+                'KeyConditionExpression': Key('profileId').eq(profileId),
+                # Guards against profile IDs that are only unique within an account
+                'FilterExpression': Attr('accountId').eq(accountId)
+            }
+        else:
+            query_kwargs = {'KeyConditionExpression': Key('accountId').eq(accountId)}
+        query_kwargs['ProjectionExpression'] = 'accountId, movieId'
 
-        response = table.query(**query_kwargs)
-        items_to_delete = response.get('Items', [])
+        items_to_delete = query_all_items(_watchlists_table, **query_kwargs)
 
-        # Handle pagination
-        while 'LastEvaluatedKey' in response:
-            response = table.query(
-                **query_kwargs,
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            items_to_delete.extend(response.get('Items', []))
-
-        # Batch delete items
-        with table.batch_writer() as batch:
-            for item in items_to_delete:
-                batch.delete_item(
-                    Key={
-                        'accountId': item['accountId'],
-                        'movieId': item['movieId']
-                    }
-                )
+        # Batch delete items, sending 25-item batches in parallel for large watchlists
+        chunks = [
+            items_to_delete[i:i + BATCH_WRITE_LIMIT]
+            for i in range(0, len(items_to_delete), BATCH_WRITE_LIMIT)
+        ]
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(DELETE_WORKERS, len(chunks))) as executor:
+                # Consume the results so any worker error propagates
+                list(executor.map(_delete_watchlist_items, chunks))
+        elif chunks:
+            _delete_watchlist_items(chunks[0])
 
         return {
             'statusCode': 200,
             'message': 'Watchlist deleted successfully',
             'deletedCount': len(items_to_delete),
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat()
         }
 
     except ClientError as e:
@@ -493,51 +672,37 @@ def handle_get_watch_history(data: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': 'Watch History table not configured', 'statusCode': 500}
     
     try:
-        table = dynamodb.Table(WATCH_HISTORY_TABLE)
-        
         # Use profileId if provided, otherwise get all history for the user
         if profileId:
             # Query using GSI for specific profile
-            response = table.query(
-                IndexName='ProfileIndex',
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('profileId').eq(profileId),
-                Limit=limit,
-                ScanIndexForward=False  # Most recent first
-            )
+            key_kwargs = {
+                'IndexName': 'ProfileIndex',
+                'KeyConditionExpression': 'profileId = :key',
+                'ExpressionAttributeValues': {':key': {'S': profileId}}
+            }
         else:
             # Query history for this user
-            response = table.query(
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('accountId').eq(accountId),
-                Limit=limit,
-                ScanIndexForward=False  # Most recent first
-            )
-        
-        history_items = response.get('Items', [])
+            key_kwargs = {
+                'KeyConditionExpression': 'accountId = :key',
+                'ExpressionAttributeValues': {':key': {'S': accountId}}
+            }
         
-        # Handle pagination for GSI query if needed
-        while 'LastEvaluatedKey' in response and len(history_items) < limit:
-            if profileId:
-                response = table.query(
-                    IndexName='ProfileIndex',
-                    KeyConditionExpression=boto3.dynamodb.conditions.Key('profileId').eq(profileId),
-                    ExclusiveStartKey=response['LastEvaluatedKey'],
-                    Limit=limit - len(history_items),
-                    ScanIndexForward=False
-                )
-            else:
-                response = table.query(
-                    KeyConditionExpression=boto3.dynamodb.conditions.Key('accountId').eq(accountId),
-                    ExclusiveStartKey=response['LastEvaluatedKey'],
-                    Limit=limit - len(history_items),
-                    ScanIndexForward=False
-                )
-            history_items.extend(response.get('Items', []))
+        history_items = [
+            _deserialize_item(item)
+            for item in query_all_items(
+                _ddb,
+                limit=limit,
+                TableName=WATCH_HISTORY_TABLE,
+                ScanIndexForward=False,  # Most recent first
+                **key_kwargs
+            )
+        ]
         
         return {
             'statusCode': 200,
             'history': history_items,
             'count': len(history_items),
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat()
         }
         
     except ClientError as e:
@@ -579,7 +744,7 @@ def handle_record_watch(data: Dict[str, Any]) -> Dict[str, Any]:
         'message': 'Watch event recorded successfully (stub)',
         'operation': 'recordWatch',
         'statusCode': 200,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.now(timezone.utc).isoformat()
     }
 
 def handle_delete_watch_history(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -602,7 +767,7 @@ def handle_delete_watch_history(data: Dict[str, Any]) -> Dict[str, Any]:
         'message': 'Watch history deleted successfully (stub)',
         'operation': 'deleteWatchHistory',
         'statusCode': 200,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.now(timezone.utc).isoformat()
     }
 
 def handle_update_watch_record(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -627,7 +792,7 @@ def handle_update_watch_record(data: Dict[str, Any]) -> Dict[str, Any]:
         'message': 'Watch record updated successfully (stub)',
         'operation': 'updateWatchRecord',
         'statusCode': 200,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.now(timezone.utc).isoformat()
     }
 
 def handle_get_watch_detail(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -650,7 +815,7 @@ def handle_get_watch_detail(data: Dict[str, Any]) -> Dict[str, Any]:
         'operation': 'getWatchDetail',
         'watchDetail': {'id': data.get('watchId'), 'status': 'stub'},
         'statusCode': 200,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.now(timezone.utc).isoformat()
     }
 
 def handle_update_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -675,5 +840,21 @@ def handle_update_watchlist(data: Dict[str, Any]) -> Dict[str, Any]:
         'message': 'Watchlist item updated successfully (stub)',
         'operation': 'updateWatchlist',
         'statusCode': 200,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.now(timezone.utc).isoformat()
     }
+
+# Operation routing table used by lambda_handler - only watchlist related operations
+_HANDLERS = {
+    # Test operation
+    'test': handle_test,
+    
+    # Watchlist Operations
+    'getWatchlist': handle_get_watchlist,
+    'deleteWatchlist': handle_delete_watchlist,
+    'updateWatchlist': handle_update_watchlist,
+    
+    # Watch History Operations
+    'getWatchHistory': handle_get_watch_history,
+    'deleteWatchHistory': handle_delete_watch_history,
+    'updateWatchRecord': handle_update_watch_record
+}